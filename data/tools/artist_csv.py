@@ -0,0 +1,338 @@
+"""
+Artist.csv 读写工具：轮询器与 data/tools 下的脚本共用，保证对画师表的改写互不覆盖、中途崩溃也不会损坏文件。
+- file_lock(): 对锁文件加操作系统文件锁（fcntl/msvcrt）的跨进程锁，持有者退出或崩溃时由系统自动释放；
+- read_rows() / write_rows_atomic() / rewrite_rows_atomic(): 用标准库 csv 读写（后者逐行流式改写），
+  写入临时文件后原子替换，保留原文件的换行符与结尾格式；temp_beside() 创建这类临时文件，供其他原子写入共用；
+- load_table(): 读取解析好的画师表（多值字段已拆分、轮询时间已换算为时间戳），解析结果按列缓存为压缩的 JSON 快照
+  （只含数据，读取时不会执行代码），CSV 未变化时直接复用，供只读的轮询器与检查脚本使用；
+- UniIdAllocator: 基于位图的 uni_id 分配器，需在改写 CSV 的同一把文件锁内使用，避免并发脚本分配出重复 id。
+轮询器通过 sys.path 引入本模块，脚本与本模块位于同一目录可直接 import。
+"""
+
+import contextlib
+import csv
+import hashlib
+import io
+import os
+import json
+import tempfile
+import time
+import zlib
+from array import array
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# 等待锁的最长时间（秒）
+LOCK_TIMEOUT = 30
+
+# uni_id 为六位十进制数，可用空间为 000000~999999
+UNI_ID_SPACE = 1000000
+
+# 快照格式版本，ArtistTable 或快照结构变化时递增，旧快照会被自动重建
+SNAPSHOT_VERSION = 2
+
+
+def _try_lock(fd: int) -> bool:
+    """对文件描述符加非阻塞的排他锁，已被其他进程持有时返回 False"""
+    try:
+        if os.name == 'nt':
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(fd: int):
+    if os.name == 'nt':
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def file_lock(path: str, timeout: float = LOCK_TIMEOUT) -> Iterator[None]:
+    """
+    对 path 加跨进程锁（锁文件为 path + '.lock'），超时抛出 TimeoutError。
+    锁由操作系统维护在锁文件的描述符上，持有者退出或崩溃时自动释放，不需要按修改时间判断过期；
+    锁文件本身保留不删除（删除会让等待者与新来者锁住不同的文件），其中记录最近一次持有者的 PID 供排查
+    """
+    lock_path = f"{path}.lock"
+    deadline = time.monotonic() + timeout
+    fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+    try:
+        while not _try_lock(fd):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"等待文件锁超时: {lock_path}")
+            time.sleep(0.1)
+        try:
+            os.ftruncate(fd, 0)
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, str(os.getpid()).encode('ascii'))
+            yield
+        finally:
+            _unlock(fd)
+    finally:
+        os.close(fd)
+
+
+def _detect_layout(csv_path: str) -> Tuple[str, bool]:
+    """沿用原文件的换行符及末尾是否有换行，避免一次小改动让整个文件的格式都变掉"""
+    with open(csv_path, 'rb') as f:
+        first_line = f.readline()
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return '\n', True
+        f.seek(-1, os.SEEK_END)
+        trailing = f.read(1) == b'\n'
+    return ('\r\n' if first_line.endswith(b'\r\n') else '\n'), trailing
+
+
+def read_rows(csv_path: str, encoding: str = 'utf-8') -> Tuple[List[str], List[Dict[str, str]]]:
+    """读取 CSV，返回 (列名, 行列表)，所有值均为字符串"""
+    with open(csv_path, 'r', encoding=encoding, newline='') as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+        return list(reader.fieldnames or []), rows
+
+
+def row_values(fieldnames: List[str], row: Dict[str, str]) -> List[str]:
+    """
+    把 DictReader 风格的行还原为字段列表：字段比列名少的行（缺少的列为 None）保持原有字段数，
+    比列名多的行（多余字段在键 None 下）把多余字段原样放在行尾
+    """
+    values = [row.get(column) for column in fieldnames]
+    while values and values[-1] is None:
+        values.pop()
+    values = ['' if value is None else value for value in values]
+    return values + list(row.get(None) or [])
+
+
+def temp_beside(path: str) -> Tuple[int, str]:
+    """
+    在目标文件所在目录创建唯一命名的临时文件（同一文件系统内 os.replace 才是原子的），返回 (描述符, 路径)。
+    mkstemp 创建的文件权限为 0600，目标文件已存在时改回其原有权限，替换后权限不变
+    """
+    directory, name = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory or '.', prefix=f".{name}.", suffix='.tmp')
+    with contextlib.suppress(OSError):
+        os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+    return fd, tmp_path
+
+
+def write_rows_atomic(csv_path: str, fieldnames: List[str], rows: List[Dict[str, str]]):
+    """写入临时文件并落盘后原子替换原文件"""
+    newline, trailing = _detect_layout(csv_path) if os.path.exists(csv_path) else ('\n', True)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator=newline)
+    writer.writerow(fieldnames)
+    writer.writerows(row_values(fieldnames, row) for row in rows)
+    content = buffer.getvalue()
+    if not trailing:
+        content = content[:-len(newline)]
+
+    fd, tmp_path = temp_beside(csv_path)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, csv_path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+
+def rewrite_rows_atomic(csv_path: str, transform: Callable[[int, Dict[str, str]], Dict[str, str]]) -> bool:
+    """
+    逐行流式读取 CSV，经 transform(行号, 行) 处理后写入临时文件，有改动时原子替换原文件（调用方需持有文件锁）
+    :return: 是否有行发生变化（无变化时不替换原文件）
+    """
+    newline, trailing = _detect_layout(csv_path)
+    fd, tmp_path = temp_beside(csv_path)
+    changed = False
+    try:
+        with open(csv_path, 'r', encoding='utf-8', newline='') as src, \
+                os.fdopen(fd, 'w', encoding='utf-8', newline='') as dst:
+            reader = csv.DictReader(src)
+            fieldnames = list(reader.fieldnames or [])
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator=newline)
+            writer.writerow(fieldnames)
+            # 最后一行单独保留到结尾，以便按原文件决定是否带结尾换行
+            pending = buffer.getvalue()
+            for row_no, row in enumerate(reader, 2):
+                new_row = transform(row_no, dict(row))
+                changed = changed or new_row != row
+                dst.write(pending)
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerow(row_values(fieldnames, new_row))
+                pending = buffer.getvalue()
+            dst.write(pending if trailing else pending[:-len(newline)])
+            dst.flush()
+            os.fsync(dst.fileno())
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+    if not changed:
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, csv_path)
+    return True
+
+
+def split_multi(value: str) -> List[str]:
+    """拆分 ';' 拼接的多值字段并去掉每项两端的空白"""
+    return [part.strip() for part in value.split(';')] if value else []
+
+
+def parse_roll_time(value: str) -> int:
+    """把 YYYY:MM:DD 格式的轮询时间换算为当日零点的时间戳，空值或格式无效时为 0"""
+    try:
+        return int(datetime.strptime(value, "%Y:%m:%d").timestamp()) if value else 0
+    except ValueError:
+        return 0
+
+
+class ArtistTable:
+    """
+    解析后的画师表：原始行之外，预先按平台拆分好多值的 id 列，并把轮询时间换算为时间戳
+    - rows[i]: 第 i 行的原始字符串值
+    - ids[platform][i]: 第 i 行该平台的 id 列表
+    - roll_times[platform][i]: 第 i 行该平台轮询时间的时间戳（空值或无效为 0）
+    """
+
+    def __init__(self, fieldnames: List[str], rows: List[Dict[str, str]],
+                 roll_times: Optional[Dict[str, List[int]]] = None):
+        """:param roll_times: 已换算好的轮询时间（从快照恢复时传入），None 时从 rows 解析"""
+        self.fieldnames = fieldnames
+        self.rows = rows
+        self.platforms = [column[:-len("_url")] for column in fieldnames if column.endswith("_url")]
+        self.ids: Dict[str, List[List[str]]] = {
+            platform: [split_multi(row.get(f"{platform}_id") or '') for row in rows]
+            for platform in self.platforms
+        }
+        if roll_times is None:
+            roll_times = {
+                platform: [parse_roll_time(row.get(f"{platform}_roll_time") or '') for row in rows]
+                for platform in self.platforms if f"{platform}_roll_time" in fieldnames
+            }
+        self.roll_times: Dict[str, array] = {platform: array('q', values) for platform, values in roll_times.items()}
+
+    def to_snapshot(self) -> Dict:
+        """
+        转换为只含列表与字符串的快照数据：每列一个值列表（缺少的字段为 None），多余字段按行号单独保存；
+        ids 由 id 列拆分即可得到，不重复保存
+        """
+        return {
+            "fieldnames": self.fieldnames,
+            "columns": [[row.get(column) for row in self.rows] for column in self.fieldnames],
+            "overflow": {str(i): row[None] for i, row in enumerate(self.rows) if row.get(None)},
+            "roll_times": {platform: values.tolist() for platform, values in self.roll_times.items()},
+        }
+
+    @classmethod
+    def from_snapshot(cls, data: Dict) -> 'ArtistTable':
+        """由 to_snapshot() 的结果还原，行与 csv.DictReader 读出的相同"""
+        fieldnames = data["fieldnames"]
+        rows = [dict(zip(fieldnames, values)) for values in zip(*data["columns"])] if fieldnames else []
+        for i, extra in data["overflow"].items():
+            rows[int(i)][None] = extra
+        return cls(fieldnames, rows, data["roll_times"])
+
+
+def load_table(csv_path: str, encoding: str = 'utf-8') -> ArtistTable:
+    """
+    读取并解析画师表。解析结果以 zlib 压缩的 JSON 快照缓存在 CSV 旁（<csv 去扩展名>.snapshot），
+    CSV 的修改时间与大小不变时直接读取快照；二者变化但内容哈希不变时同样复用，只在内容变化时重新解析。
+    快照只含数据，损坏或被篡改时最多导致重新解析，不会像反序列化 pickle 那样执行任意代码
+    """
+    snapshot_path = f"{os.path.splitext(csv_path)[0]}.snapshot"
+    stat = os.stat(csv_path)
+    signature = [stat.st_mtime_ns, stat.st_size]
+
+    cached = table = None
+    try:
+        with open(snapshot_path, 'rb') as f:
+            cached = json.loads(zlib.decompress(f.read()))
+        if cached.get("version") != SNAPSHOT_VERSION or cached.get("encoding") != encoding:
+            cached = None
+        elif cached["signature"] == signature:
+            return ArtistTable.from_snapshot(cached["table"])
+    except (OSError, zlib.error, ValueError, AttributeError, KeyError, TypeError, IndexError):
+        cached = None
+
+    with open(csv_path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()
+    if cached and cached.get("sha256") == digest:
+        with contextlib.suppress(ValueError, AttributeError, KeyError, TypeError, IndexError):
+            table = ArtistTable.from_snapshot(cached["table"])
+    if table is None:
+        reader = csv.DictReader(io.StringIO(content.decode(encoding), newline=''))
+        rows = list(reader)
+        table = ArtistTable(list(reader.fieldnames or []), rows)
+
+    snapshot = {
+        "version": SNAPSHOT_VERSION, "encoding": encoding, "signature": signature, "sha256": digest,
+        "table": table.to_snapshot()
+    }
+    # 临时文件名唯一，多个进程同时重建快照时不会互相截断或替换到对方写了一半的文件
+    try:
+        fd, tmp_path = temp_beside(snapshot_path)
+    except OSError:
+        return table  # 快照只是缓存，写入失败不影响本次读取
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(zlib.compress(json.dumps(snapshot, ensure_ascii=False, separators=(',', ':')).encode('utf-8')))
+        os.replace(tmp_path, snapshot_path)
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+    return table
+
+
+class UniIdAllocator:
+    """
+    uni_id 分配器：六位十进制 id 空间（000000~999999）的使用情况保存为位图（约 122KB），
+    从小到大分配空闲 id，游标只向前移动，分配 k 个 id 只需扫描 k 个空闲位及其间已占用的位
+    """
+
+    def __init__(self, used_ids: Iterable[int] = ()):
+        self.bitmap = bytearray(UNI_ID_SPACE // 8)
+        self.cursor = 0
+        for uid in used_ids:
+            self.mark_used(uid)
+
+    def mark_used(self, uid: int):
+        """标记一个 id 已被占用"""
+        self.bitmap[uid >> 3] |= 1 << (uid & 7)
+
+    def is_used(self, uid: int) -> bool:
+        return bool(self.bitmap[uid >> 3] & (1 << (uid & 7)))
+
+    def allocate(self, count: int) -> List[str]:
+        """分配 count 个最小的空闲 id（六位补零），空间不足时抛出 ValueError"""
+        new_ids = []
+        while len(new_ids) < count:
+            # 整字节都已占用时一次跳过 8 个 id
+            while self.cursor < UNI_ID_SPACE and self.bitmap[self.cursor >> 3] == 0xFF:
+                self.cursor = (self.cursor | 7) + 1
+            if self.cursor >= UNI_ID_SPACE:
+                raise ValueError(f"无法生成足够的唯一ID：需要 {count} 个，只剩 {len(new_ids)} 个可用")
+            if not self.is_used(self.cursor):
+                self.mark_used(self.cursor)
+                new_ids.append(f"{self.cursor:06d}")
+            self.cursor += 1
+        return new_ids
@@ -0,0 +1,286 @@
+"""
+画师注册表：把 Artist.csv 导入 SQLite，按画师与平台账号两张规范化的表保存，供轮询器和脚本做索引查询与单点更新。
+- artists：每行一个画师（保留 CSV 中的行顺序），uni_id 建有索引；
+- accounts：每个平台账号一行，';' 拼接的多账号按位置拆开，(platform, platform_id) 建有索引；
+- roll_times：每个画师在各平台的轮询时间。
+CSV 仍是人工编辑的入口：打开注册表时若 CSV 有变化会自动重新导入；set_roll_time() 只更新数据库中的对应行，
+export_csv() 在文件锁内把变化写回 CSV（期间 CSV 若被其他脚本修改，会先合并再写回），导入再导出与原文件逐字节一致。
+
+用法: python "data/tools/artist_registry.py" import|export|lookup <platform> <platform_id>
+"""
+
+import json
+import os
+import sqlite3
+import sys
+from typing import Dict, Iterator, List, Optional
+
+import artist_csv
+
+# 画师本身的字段，其余列中 <平台>_name/_id/_url/_roll_time 归入平台账号，剩下的未知列原样保存在 extra 中
+ARTIST_COLUMNS = ("name", "name_used", "uni_id", "tags", "tips")
+ACCOUNT_COLUMNS = ("name", "id", "url")
+
+
+class ArtistRegistry:
+    """画师注册表类：SQLite 保存的 Artist.csv，支持无损导入导出与按索引的单点查询、更新"""
+
+    def __init__(self, csv_path: str = "data/Artist.csv", db_path: Optional[str] = None, check_same_thread: bool = True):
+        """
+        :param check_same_thread: 传给 sqlite3.connect；为 False 时可在其他线程中使用（如轮询器用 asyncio.to_thread
+            写回 CSV），调用方需自行保证同一时间只有一个线程使用注册表
+        """
+        self.csv_path = csv_path
+        self.db_path = db_path or f"{os.path.splitext(csv_path)[0]}.db"
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=check_same_thread)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS artists (
+                row_no INTEGER PRIMARY KEY,
+                uni_id TEXT NOT NULL DEFAULT '',
+                name TEXT NOT NULL DEFAULT '',
+                name_used TEXT NOT NULL DEFAULT '',
+                tags TEXT NOT NULL DEFAULT '',
+                tips TEXT NOT NULL DEFAULT '',
+                extra TEXT NOT NULL DEFAULT '{}',
+                field_count INTEGER,
+                overflow TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_artists_uni_id ON artists (uni_id);
+            CREATE TABLE IF NOT EXISTS accounts (
+                row_no INTEGER NOT NULL,
+                platform TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                name TEXT,
+                platform_id TEXT,
+                url TEXT,
+                PRIMARY KEY (row_no, platform, position)
+            );
+            CREATE INDEX IF NOT EXISTS idx_accounts_platform_id ON accounts (platform, platform_id);
+            CREATE TABLE IF NOT EXISTS roll_times (
+                row_no INTEGER NOT NULL,
+                platform TEXT NOT NULL,
+                roll_time TEXT NOT NULL,
+                PRIMARY KEY (row_no, platform)
+            );
+            -- 尚未写回 CSV 的轮询时间，重新导入 CSV 后会再次应用
+            CREATE TABLE IF NOT EXISTS pending_roll_times (
+                platform TEXT NOT NULL,
+                platform_id TEXT NOT NULL,
+                roll_time TEXT NOT NULL,
+                PRIMARY KEY (platform, platform_id)
+            );
+            """
+        )
+        # 旧版本的库缺少 field_count/overflow 两列：补上并强制从 CSV 重新导入
+        artist_columns = {row[1] for row in self.conn.execute("PRAGMA table_info(artists)")}
+        if "field_count" not in artist_columns:
+            self.conn.execute("ALTER TABLE artists ADD COLUMN field_count INTEGER")
+            self.conn.execute("ALTER TABLE artists ADD COLUMN overflow TEXT")
+            self.conn.execute("DELETE FROM meta WHERE key = 'csv_signature'")
+        self.conn.commit()
+        self.sync()
+
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+
+    def _get_meta(self, key: str, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def _set_meta(self, key: str, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, json.dumps(value, ensure_ascii=False)))
+
+    def _csv_signature(self) -> Optional[List[int]]:
+        try:
+            stat = os.stat(self.csv_path)
+        except FileNotFoundError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def sync(self) -> bool:
+        """CSV 自上次导入/导出后有变化时重新导入，并重新应用尚未写回的轮询时间；返回是否重新导入"""
+        signature = self._csv_signature()
+        if signature is None or signature == self._get_meta("csv_signature"):
+            return False
+        self.import_csv()
+        return True
+
+    def import_csv(self) -> int:
+        """从 CSV 全量导入（在一个事务内替换全部数据），返回画师行数"""
+        signature = self._csv_signature()
+        fieldnames, rows = artist_csv.read_rows(self.csv_path)
+        platforms = [column[:-len("_url")] for column in fieldnames if column.endswith("_url")]
+        platform_columns = {
+            f"{platform}_{suffix}"
+            for platform in platforms for suffix in (*ACCOUNT_COLUMNS, "roll_time")
+        }
+
+        with self.conn:
+            for table in ("artists", "accounts", "roll_times"):
+                self.conn.execute(f"DELETE FROM {table}")
+            for row_no, row in enumerate(rows):
+                extra = {
+                    column: value or '' for column, value in row.items()
+                    if column is not None and column not in ARTIST_COLUMNS and column not in platform_columns
+                }
+                # 手工编辑的行可能比列名少（缺少的列为 None）或多（多余字段在键 None 下），导出时按原样还原
+                values = artist_csv.row_values(fieldnames, row)
+                field_count = len(values) if len(values) < len(fieldnames) else None
+                overflow = json.dumps(row[None], ensure_ascii=False) if row.get(None) else None
+                self.conn.execute(
+                    "INSERT INTO artists VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (row_no, *(row.get(column) or '' for column in ("uni_id", "name", "name_used", "tags", "tips")),
+                     json.dumps(extra, ensure_ascii=False), field_count, overflow)
+                )
+                for platform in platforms:
+                    self._insert_accounts(row_no, platform, row)
+                    if f"{platform}_roll_time" in row:
+                        self.conn.execute(
+                            "INSERT INTO roll_times VALUES (?, ?, ?)",
+                            (row_no, platform, row[f"{platform}_roll_time"] or '')
+                        )
+            self._set_meta("columns", fieldnames)
+            self._set_meta("csv_signature", signature)
+            for platform, platform_id, roll_time in self.conn.execute(
+                "SELECT platform, platform_id, roll_time FROM pending_roll_times"
+            ).fetchall():
+                self._update_roll_time(platform, platform_id, roll_time)
+        return len(rows)
+
+    def _insert_accounts(self, row_no: int, platform: str, row: Dict[str, str]):
+        """按位置拆开 ';' 拼接的多账号；某列项数较少时缺少的位置存为 NULL，导出时据此还原原始写法"""
+        values = {
+            column: (row.get(f"{platform}_{column}") or '').split(';') if row.get(f"{platform}_{column}") else []
+            for column in ACCOUNT_COLUMNS
+        }
+        for position in range(max(len(v) for v in values.values())):
+            self.conn.execute(
+                "INSERT INTO accounts VALUES (?, ?, ?, ?, ?, ?)",
+                (row_no, platform, position,
+                 *(v[position] if position < len(v) else None for v in values.values()))
+            )
+
+    def rows(self) -> Iterator[Dict[str, str]]:
+        """按 CSV 的列与行顺序还原每一行（与 csv.DictReader 相同：缺少的字段为 None，多余字段在键 None 下）"""
+        columns = self._get_meta("columns", [])
+        platforms = [column[:-len("_url")] for column in columns if column.endswith("_url")]
+        accounts: Dict[tuple, List[tuple]] = {}
+        for row_no, platform, name, platform_id, url in self.conn.execute(
+            "SELECT row_no, platform, name, platform_id, url FROM accounts ORDER BY row_no, platform, position"
+        ):
+            accounts.setdefault((row_no, platform), []).append((name, platform_id, url))
+        roll_times = {
+            (row_no, platform): roll_time
+            for row_no, platform, roll_time in self.conn.execute("SELECT row_no, platform, roll_time FROM roll_times")
+        }
+
+        for row_no, uni_id, name, name_used, tags, tips, extra, field_count, overflow in self.conn.execute(
+            "SELECT row_no, uni_id, name, name_used, tags, tips, extra, field_count, overflow FROM artists ORDER BY row_no"
+        ):
+            values = {"uni_id": uni_id, "name": name, "name_used": name_used, "tags": tags, "tips": tips}
+            values.update(json.loads(extra))
+            for platform in platforms:
+                platform_accounts = accounts.get((row_no, platform), [])
+                for i, column in enumerate(ACCOUNT_COLUMNS):
+                    parts = [account[i] for account in platform_accounts if account[i] is not None]
+                    values[f"{platform}_{column}"] = ';'.join(parts)
+                values[f"{platform}_roll_time"] = roll_times.get((row_no, platform), '')
+            row = {column: values.get(column, '') for column in columns}
+            if field_count is not None:
+                # 原行缺少的字段仍为空时保持缺少；之后被写入的值（如轮询时间）照常导出
+                for column in columns[field_count:]:
+                    if not row[column]:
+                        row[column] = None
+            if overflow:
+                row[None] = json.loads(overflow)
+            yield row
+
+    def export_csv(self) -> bool:
+        """
+        在文件锁内把数据库写回 CSV；若 CSV 在此期间被其他脚本修改，先重新导入再应用未写回的轮询时间
+        :return: 是否写入了文件（没有待写回的轮询时间时不重写，不会改动人工编辑过的 CSV）
+        """
+        with artist_csv.file_lock(self.csv_path):
+            self.sync()
+            pending = self.conn.execute("SELECT COUNT(*) FROM pending_roll_times").fetchone()[0]
+            if not pending:
+                return False
+            artist_csv.write_rows_atomic(self.csv_path, self._get_meta("columns", []), list(self.rows()))
+            with self.conn:
+                self.conn.execute("DELETE FROM pending_roll_times")
+                self._set_meta("csv_signature", self._csv_signature())
+        return True
+
+    def get_artist(self, uni_id: str) -> Optional[Dict]:
+        """按 uni_id 查找画师"""
+        row = self.conn.execute(
+            "SELECT row_no, uni_id, name FROM artists WHERE uni_id = ?", (uni_id,)
+        ).fetchone()
+        return {"row_no": row[0], "uni_id": row[1], "name": row[2]} if row else None
+
+    def find_accounts(self, platform: str, platform_id: Optional[str] = None) -> List[Dict]:
+        """
+        查找平台账号及所属画师与该平台的轮询时间
+        :param platform_id: 只查该账号，None 表示该平台的全部账号（按 CSV 行顺序）
+        """
+        sql = """
+            SELECT a.row_no, ar.uni_id, ar.name, a.name, a.platform_id, a.url, COALESCE(r.roll_time, '')
+            FROM accounts a
+            JOIN artists ar ON ar.row_no = a.row_no
+            LEFT JOIN roll_times r ON r.row_no = a.row_no AND r.platform = a.platform
+            WHERE a.platform = ?
+        """
+        params = [platform]
+        if platform_id is not None:
+            sql += " AND a.platform_id = ?"
+            params.append(platform_id)
+        sql += " ORDER BY a.row_no, a.position"
+        return [
+            {
+                "row_no": row_no, "uni_id": uni_id, "artist_name": artist_name,
+                "name": name or '', "id": account_id or '', "url": url or '', "roll_time": roll_time
+            }
+            for row_no, uni_id, artist_name, name, account_id, url, roll_time in self.conn.execute(sql, params)
+        ]
+
+    def set_roll_time(self, platform: str, platform_id: str, roll_time: str) -> int:
+        """更新拥有该账号的画师在该平台的轮询时间（单点更新，不重写 CSV），返回实际变化的行数"""
+        with self.conn:
+            changed = self._update_roll_time(platform, platform_id, roll_time)
+            if changed:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO pending_roll_times VALUES (?, ?, ?)", (platform, platform_id, roll_time)
+                )
+        return changed
+
+    def _update_roll_time(self, platform: str, platform_id: str, roll_time: str) -> int:
+        return self.conn.execute(
+            """
+            UPDATE roll_times SET roll_time = ?
+            WHERE platform = ? AND roll_time != ?
+              AND row_no IN (SELECT row_no FROM accounts WHERE platform = ? AND platform_id = ?)
+            """,
+            (roll_time, platform, roll_time, platform, platform_id)
+        ).rowcount
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "import"
+    registry = ArtistRegistry()
+    if command == "import":
+        print(f"已导入 {registry.import_csv()} 行到 {registry.db_path}")
+    elif command == "export":
+        print("已写回 CSV" if registry.export_csv() else "没有需要写回的改动")
+    elif command == "lookup" and len(sys.argv) == 4:
+        for account in registry.find_accounts(sys.argv[2], sys.argv[3]):
+            print(account)
+    else:
+        print(__doc__)
+    registry.close()
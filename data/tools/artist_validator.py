@@ -0,0 +1,484 @@
+"""
+Artist.csv 校验引擎：规则在导入时一次编译，按列批量校验，同一列中重复出现的值只校验一次。
+- 输出带规则编号的结构化结果（可写成 JSON 报告），存在 error 级别问题时命令行以非零状态码退出；
+- 增量模式按行内容哈希缓存每行的校验结果，只重新校验上次之后新增或改动的行，
+  uni_id 重复等跨行规则与列名规则每次都对全表检查（只是集合运算，开销很小）。
+
+- 修复模式（--fix）单次流式遍历全表，应用安全的自动修复：去除账号列（<平台>_name/_id/_url）与 tags 中
+  各项的多余空格与不可见字符（tips 等自由文本列不动）、规范化主页 URL
+  （twitter.com -> x.com、统一 https、去掉查询串与子页面，保留开头的 '*' 标记）、按 id 顺序重排 URL、由 URL 补全缺失的 id，
+  在文件锁内原子写回并输出逐字段的修改报告；--dry-run 只输出报告不写回，并在内存中校验修复后的结果。
+  修复后再对结果做一次校验。
+
+用法: python "data/tools/artist_validator.py" [csv 路径] [--json 报告路径] [--incremental] [--fix | --dry-run]
+"""
+
+import contextlib
+import csv
+import functools
+import hashlib
+import json
+import os
+import re
+import sys
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import artist_csv
+
+# 校验缓存格式版本，规则或结果结构变化时递增
+STATE_VERSION = 1
+
+
+class Rule:
+    """一条校验规则：编号、级别与消息模板，check 返回 True 表示值合法"""
+
+    def __init__(self, rule_id: str, severity: str, message: str, check: Optional[Callable[[str], bool]] = None):
+        self.rule_id = rule_id
+        self.severity = severity
+        self.message = message
+        self.check = check
+
+    def finding(self, row: int, column: str = '', item: Optional[int] = None, value: str = '', **extra) -> Dict:
+        """生成一条校验结果"""
+        return {
+            "rule": self.rule_id, "severity": self.severity, "row": row,
+            "column": column, "item": item, "value": value, **extra
+        }
+
+
+def _fullmatch(pattern: str) -> Callable[[str], bool]:
+    compiled = re.compile(pattern)
+    return lambda value: compiled.fullmatch(value) is not None
+
+
+def _is_url(value: str) -> bool:
+    if not value.startswith(('http://', 'https://')):
+        return False
+    try:
+        result = urlparse(value)
+        return bool(result.scheme and result.netloc)
+    except ValueError:
+        return False
+
+
+_INVISIBLE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_ILLEGAL_HEADER = re.compile(r'[^\w\d_一-龥ぁ-んァ-ンー・（）()@\-.,;: ]')
+
+RULES: Dict[str, Rule] = {rule.rule_id: rule for rule in (
+    Rule("H001", "error", "列名有重复！"),
+    Rule("H002", "error", "列名有空值或多余空格: '{column}'"),
+    Rule("H003", "error", "列名含有非法字符: '{column}'", lambda name: _ILLEGAL_HEADER.search(name) is None),
+    Rule("U001", "error", "第{row}行 uni_id 为空"),
+    Rule("U002", "error", "第{row}行 uni_id 第{item}项非16进制: {value}", _fullmatch(r'[0-9a-fA-F]+')),
+    Rule("U003", "error", "第{row}行 uni_id 第{item}项重复: {value}"),
+    Rule("F001", "error", "第{row}行 字段'{column}'第{item}项格式异常: '{value}'", _fullmatch(r'[\w\-]+')),
+    Rule("F002", "error", "第{row}行 字段'{column}'第{item}项不是合法URL: '{value}'", _is_url),
+    Rule("P001", "warning", "第{row}行 {platform} 第{item}组字段有缺失: {missing}"),
+    Rule("P002", "warning", "第{row}行 {platform}_url 第{item}项非主页格式: {value}"),
+    Rule("W001", "warning", "第{row}行 字段'{column}'第{item}项有多余空格: '{value}'", lambda v: v == v.strip()),
+    Rule("W002", "warning", "第{row}行 字段'{column}'第{item}项含有不可见字符: '{value}'",
+         lambda v: _INVISIBLE.search(v) is None),
+)}
+
+# 各平台主页 URL 的规范格式
+HOMEPAGE_PATTERNS = {
+    "pixiv": _fullmatch(r'https://www\.pixiv\.net/users/\d+'),
+    "twitter": _fullmatch(r'https://x\.com/[\w\d_]+'),
+    "weibo": _fullmatch(r'https://weibo\.com/u/\d+'),
+    "bilibili": _fullmatch(r'https://space\.bilibili\.com/\d+'),
+}
+
+# 规则指纹：规则或平台格式变化时让增量缓存失效
+RULES_FINGERPRINT = hashlib.sha1(json.dumps(
+    [[r.rule_id, r.severity, r.message] for r in RULES.values()] + sorted(HOMEPAGE_PATTERNS), ensure_ascii=False
+).encode('utf-8')).hexdigest()
+
+
+def format_finding(finding: Dict) -> str:
+    """把校验结果渲染为可读的中文消息"""
+    fields = dict(finding)
+    if isinstance(fields.get("missing"), list):
+        fields["missing"] = ', '.join(fields["missing"])
+    return RULES[finding["rule"]].message.format(**fields)
+
+
+def _check_values(rule: Rule, column: str, rows_items: Dict[int, List[str]], cache: Dict[str, bool]) -> List[Dict]:
+    """对一列中所有行的各项批量应用规则，同一个值只校验一次"""
+    findings = []
+    for row, items in rows_items.items():
+        for idx, value in enumerate(items, 1):
+            if not value:
+                continue
+            ok = cache.get(value)
+            if ok is None:
+                ok = cache[value] = rule.check(value)
+            if not ok:
+                findings.append(rule.finding(row, column, idx, value))
+    return findings
+
+
+def _validate_rows(fieldnames: List[str], rows: Dict[int, Dict[str, str]]) -> List[Dict]:
+    """逐列校验给定的行（行号 -> 行），只包含单行内的规则"""
+    findings: List[Dict] = []
+    caches: Dict[str, Dict[str, bool]] = {rule_id: {} for rule_id in RULES}
+    stripped = {
+        column: {row: artist_csv.split_multi(values.get(column) or '') for row, values in rows.items()}
+        for column in fieldnames
+    }
+    raw = {
+        column: {row: (values.get(column) or '').split(';') if values.get(column) else [] for row, values in rows.items()}
+        for column in fieldnames
+    }
+
+    # uni_id 为空与格式
+    if "uni_id" in fieldnames:
+        findings += [RULES["U001"].finding(row, "uni_id") for row, values in rows.items() if not values.get("uni_id")]
+        findings += _check_values(RULES["U002"], "uni_id", stripped["uni_id"], caches["U002"])
+
+    # id 类与 url 类字段
+    for column in fieldnames:
+        if column.endswith('_id') or column == 'uni_id':
+            findings += _check_values(RULES["F001"], column, stripped[column], caches["F001"])
+        if column.endswith('_url'):
+            findings += _check_values(RULES["F002"], column, stripped[column], caches["F002"])
+
+    # 各平台 name/id/url 按组对齐与主页格式
+    for platform, homepage in HOMEPAGE_PATTERNS.items():
+        keys = [f"{platform}_name", f"{platform}_id", f"{platform}_url"]
+        if not all(key in fieldnames for key in keys):
+            continue
+        for row in rows:
+            groups = [stripped[key][row] for key in keys]
+            for idx in range(max(len(group) for group in groups)):
+                parts = [group[idx] if idx < len(group) else '' for group in groups]
+                if any(parts) and not all(parts):
+                    findings.append(RULES["P001"].finding(
+                        row, keys[0], idx + 1, platform=platform,
+                        missing=[key for key, part in zip(keys, parts) if not part]
+                    ))
+        homepage_rule = Rule("P002", RULES["P002"].severity, RULES["P002"].message, homepage)
+        for finding in _check_values(homepage_rule, keys[2], stripped[keys[2]], {}):
+            finding["platform"] = platform
+            findings.append(finding)
+
+    # 多余空格与不可见字符（按未去空白的原始项检查）
+    for column in fieldnames:
+        findings += _check_values(RULES["W001"], column, raw[column], caches["W001"])
+        findings += _check_values(RULES["W002"], column, raw[column], caches["W002"])
+    return findings
+
+
+def _row_hash(fieldnames: List[str], values: Dict[str, str]) -> str:
+    return hashlib.sha1('\x1f'.join(values.get(column) or '' for column in fieldnames).encode('utf-8')).hexdigest()
+
+
+def validate(csv_path: str, incremental: bool = False, state_path: Optional[str] = None,
+             table: Optional[artist_csv.ArtistTable] = None) -> Dict:
+    """
+    校验画师表，返回报告：{"file", "rows", "checked_rows", "errors", "warnings", "findings": [...]}
+    :param incremental: 只重新校验内容有变化的行，其余行沿用上次缓存的结果
+    :param state_path: 增量缓存文件，默认为 CSV 旁的 <csv 去扩展名>.validation.json
+    :param table: 校验给定的表（如 --dry-run 修复后只在内存中的结果）而不是读取 csv_path；
+        此时只读取增量缓存、不写回，缓存始终对应磁盘上的文件
+    """
+    in_memory = table is not None
+    table = table if in_memory else artist_csv.load_table(csv_path)
+    fieldnames = table.fieldnames
+    state_path = state_path or f"{os.path.splitext(csv_path)[0]}.validation.json"
+    fingerprint = [STATE_VERSION, RULES_FINGERPRINT, fieldnames]
+
+    cached_rows: Dict[str, List[Dict]] = {}
+    if incremental and os.path.exists(state_path):
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get("fingerprint") == fingerprint:
+                cached_rows = state["rows"]
+        except (OSError, json.JSONDecodeError, KeyError):
+            cached_rows = {}
+
+    # 行号与 Excel 一致：第 1 行是列名，数据从第 2 行开始
+    hashes = {row: _row_hash(fieldnames, values) for row, values in enumerate(table.rows, 2)}
+    changed = {row: table.rows[row - 2] for row, digest in hashes.items() if digest not in cached_rows}
+    fresh = _validate_rows(fieldnames, changed)
+
+    # 内容相同的行结果也相同，缓存中每个哈希只保存第一次出现的行的结果
+    first_rows: Dict[str, int] = {}
+    for row in changed:
+        first_rows.setdefault(hashes[row], row)
+    by_hash: Dict[str, List[Dict]] = {digest: [] for digest in first_rows}
+    for finding in fresh:
+        if first_rows[hashes[finding["row"]]] == finding["row"]:
+            by_hash[hashes[finding["row"]]].append({k: v for k, v in finding.items() if k != "row"})
+    findings = list(fresh)
+    for row, digest in hashes.items():
+        if row not in changed:
+            findings += [{**finding, "row": row} for finding in cached_rows[digest]]
+
+    # 全表规则：列名与 uni_id 重复
+    if len(fieldnames) != len(set(fieldnames)):
+        findings.append(RULES["H001"].finding(1))
+    for column in fieldnames:
+        if not column or column.strip() != column:
+            findings.append(RULES["H002"].finding(1, column))
+        if not RULES["H003"].check(column):
+            findings.append(RULES["H003"].finding(1, column))
+    if "uni_id" in fieldnames:
+        seen = set()
+        for row, values in enumerate(table.rows, 2):
+            for idx, uid in enumerate(artist_csv.split_multi(values.get("uni_id") or ''), 1):
+                if uid in seen:
+                    findings.append(RULES["U003"].finding(row, "uni_id", idx, uid))
+                seen.add(uid)
+
+    rule_order = list(RULES)
+    findings.sort(key=lambda f: (f["row"], rule_order.index(f["rule"]),
+                                 fieldnames.index(f["column"]) if f["column"] in fieldnames else -1, f["item"] or 0))
+    for finding in findings:
+        finding["message"] = format_finding(finding)
+
+    if not in_memory and (incremental or os.path.exists(state_path)):
+        live = {digest: cached_rows.get(digest, by_hash.get(digest, [])) for digest in hashes.values()}
+        # 临时文件名唯一，同时运行的两次校验不会互相截断对方的缓存
+        tmp_path = None
+        try:
+            fd, tmp_path = artist_csv.temp_beside(state_path)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"fingerprint": fingerprint, "rows": live}, f, ensure_ascii=False)
+            os.replace(tmp_path, state_path)
+        except OSError:
+            # 缓存写入失败只影响下次的增量校验速度
+            if tmp_path:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+
+    return {
+        "file": csv_path,
+        "rows": len(table.rows),
+        "checked_rows": len(changed),
+        "errors": sum(f["severity"] == "error" for f in findings),
+        "warnings": sum(f["severity"] == "warning" for f in findings),
+        "findings": findings,
+    }
+
+
+# 自动修复的编号与说明，写入修复报告
+FIXES = {
+    "N001": "去除多余空格",
+    "N002": "去除不可见字符",
+    "N003": "规范化主页URL",
+    "N004": "按 id 顺序重排URL",
+    "N005": "由URL补全缺失的 id",
+}
+
+# 各平台主页 URL：(可接受的域名, 从路径与查询串中提取 id 的函数, 规范 URL 模板)
+_TWITTER_RESERVED = {"i", "home", "search", "explore", "intent", "hashtag", "settings", "messages", "notifications"}
+_PIXIV_PATH = re.compile(r'/(?:[a-z]{2}/)?users/(\d+)')
+_PIXIV_MEMBER = re.compile(r'(?:^|&)id=(\d+)(?:&|$)')
+_TWITTER_PATH = re.compile(r'/(\w{1,15})(?:/.*)?')
+_WEIBO_PATH = re.compile(r'/(?:u/|profile/)?(\d+)(?:/.*)?')
+_BILIBILI_PATH = re.compile(r'/(\d+)(?:/.*)?')
+
+
+def _pixiv_id(path: str, query: str) -> Optional[str]:
+    match = _PIXIV_PATH.fullmatch(path) or (path == '/member.php' and _PIXIV_MEMBER.search(query))
+    return match.group(1) if match else None
+
+
+def _twitter_id(path: str, query: str) -> Optional[str]:
+    match = _TWITTER_PATH.fullmatch(path)
+    return match.group(1) if match and match.group(1).lower() not in _TWITTER_RESERVED else None
+
+
+def _weibo_id(path: str, query: str) -> Optional[str]:
+    match = _WEIBO_PATH.fullmatch(path)
+    return match.group(1) if match else None
+
+
+def _bilibili_id(path: str, query: str) -> Optional[str]:
+    match = _BILIBILI_PATH.fullmatch(path)
+    return match.group(1) if match else None
+
+
+CANONICAL_URLS = {
+    "pixiv": ({"pixiv.net", "www.pixiv.net", "touch.pixiv.net"}, _pixiv_id, "https://www.pixiv.net/users/{}"),
+    "twitter": ({"x.com", "www.x.com", "twitter.com", "www.twitter.com", "mobile.twitter.com", "mobile.x.com"},
+                _twitter_id, "https://x.com/{}"),
+    "weibo": ({"weibo.com", "www.weibo.com", "m.weibo.cn", "weibo.cn"}, _weibo_id, "https://weibo.com/u/{}"),
+    "bilibili": ({"space.bilibili.com"}, _bilibili_id, "https://space.bilibili.com/{}"),
+}
+
+
+@functools.lru_cache(maxsize=None)
+def canonical_url(platform: str, url: str) -> Tuple[str, Optional[str]]:
+    """
+    把平台主页 URL 规范化（统一域名与 https，去掉查询串、子页面与结尾斜杠），返回 (规范 URL, 从中提取的 id)；
+    无法识别的 URL 原样返回，id 为 None。开头的 '*' 标记会保留
+    """
+    marker, bare = ('*', url[1:]) if url.startswith('*') else ('', url)
+    hosts, extract, template = CANONICAL_URLS[platform]
+    try:
+        parsed = urlparse(bare)
+    except ValueError:
+        return url, None
+    if parsed.scheme not in ('http', 'https') or parsed.netloc.lower() not in hosts:
+        return url, None
+    platform_id = extract(parsed.path.rstrip('/'), parsed.query)
+    if platform_id is None:
+        return url, None
+    return marker + template.format(platform_id), marker + platform_id
+
+
+def _cleanable_columns(row: Dict[str, str], platforms: List[str]) -> List[str]:
+    """需要逐项清理空白的列：各平台账号的 name/id/url 与 tags（';' 分隔的多值列），tips 等自由文本列原样保留"""
+    account = {f"{platform}_{suffix}" for platform in platforms for suffix in ("name", "id", "url")}
+    return [column for column in row if column is not None and (column in account or column == "tags")]
+
+
+def _clean_items(value: str, fixes: set) -> str:
+    """逐项去除两端空白与不可见字符，保留空项（空项表示该位置缺少值，与其他列按位置对应）"""
+    items = value.split(';')
+    cleaned = []
+    for item in items:
+        visible = _INVISIBLE.sub('', item)
+        if visible != item:
+            fixes.add("N002")
+        if visible.strip() != visible:
+            fixes.add("N001")
+        cleaned.append(visible.strip())
+    return ';'.join(cleaned)
+
+
+def _align_urls(ids: List[str], urls: List[str], derived: List[Optional[str]]) -> Optional[List[str]]:
+    """id 与 URL 一一对应但顺序不同时，返回按 id 顺序重排后的 URL；无法确定对应关系时返回 None"""
+    if len(ids) != len(urls) or ids == derived or not all(ids):
+        return None
+    if len(set(ids)) != len(ids) or sorted(ids) != sorted(d or '' for d in derived):
+        return None
+    by_id = dict(zip(derived, urls))
+    return [by_id[platform_id] for platform_id in ids]
+
+
+def normalize_row(row: Dict[str, str], platforms: List[str]) -> List[Dict]:
+    """就地修复一行，返回每个被修改字段的 {"column", "before", "after", "fixes"}"""
+    fixes: Dict[str, set] = {column: set() for column in row if column is not None}
+    before = {column: row[column] for column in fixes}
+
+    for column in _cleanable_columns(row, platforms):
+        if row[column]:
+            row[column] = _clean_items(row[column], fixes[column])
+
+    for platform in platforms:
+        id_key, url_key = f"{platform}_id", f"{platform}_url"
+        if not row.get(url_key) or platform not in CANONICAL_URLS:
+            continue
+        urls = row[url_key].split(';')
+        canonical = [canonical_url(platform, url) if url else (url, None) for url in urls]
+        if [url for url, _ in canonical] != urls:
+            fixes[url_key].add("N003")
+            urls = [url for url, _ in canonical]
+        derived = [platform_id for _, platform_id in canonical]
+
+        if id_key not in row:
+            row[url_key] = ';'.join(urls)
+            continue
+        ids = row[id_key].split(';') if row[id_key] else []
+        aligned = _align_urls(ids, urls, derived)
+        if aligned is not None and aligned != urls:
+            fixes[url_key].add("N004")
+            derived = ids[:]
+            urls = aligned
+        # 已有的 id 与 URL 按位置对不上时无法确定补到哪一组，整列保持原样
+        consistent = all(
+            not platform_id or derived[idx] in (None, platform_id)
+            for idx, platform_id in enumerate(ids[:len(derived)])
+        )
+        for idx, platform_id in enumerate(derived if consistent else []):
+            if platform_id is None:
+                continue
+            if idx >= len(ids):
+                ids += [''] * (idx + 1 - len(ids))
+            if not ids[idx]:
+                ids[idx] = platform_id
+                fixes[id_key].add("N005")
+        row[url_key] = ';'.join(urls)
+        row[id_key] = ';'.join(ids)
+
+    return [
+        {"column": column, "before": before[column], "after": row[column], "fixes": sorted(fixes[column])}
+        for column in fixes if row[column] != before[column]
+    ]
+
+
+def normalize(csv_path: str, dry_run: bool = False) -> Dict:
+    """
+    单次流式遍历画师表并应用安全的自动修复，在文件锁内原子写回（dry_run 时只生成报告）
+    返回修复报告：{"file", "written", "changes": [{"row", "column", "before", "after", "fixes"}, ...]}，
+    dry_run 时另含 "table"：修复后只在内存中的画师表，供 validate(table=...) 校验
+    """
+    changes: List[Dict] = []
+    platforms: List[str] = []
+
+    def fix(row_no: int, row: Dict[str, str]) -> Dict[str, str]:
+        if not platforms:
+            platforms.extend(column[:-len("_url")] for column in row if column and column.endswith("_url"))
+        changes.extend({"row": row_no, **change} for change in normalize_row(row, platforms))
+        return row
+
+    if dry_run:
+        with open(csv_path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            rows = [fix(row_no, row) for row_no, row in enumerate(reader, 2)]
+            table = artist_csv.ArtistTable(list(reader.fieldnames or []), rows)
+        return {"file": csv_path, "written": False, "changes": changes, "table": table}
+    with artist_csv.file_lock(csv_path):
+        written = artist_csv.rewrite_rows_atomic(csv_path, fix)
+    return {"file": csv_path, "written": written, "changes": changes}
+
+
+def main(argv: List[str]) -> int:
+    """命令行入口，返回退出码：有 error 级别问题时为 1"""
+    csv_path, report_path, incremental, fix, dry_run = "data/Artist.csv", None, False, False, False
+    args = iter(argv)
+    for arg in args:
+        if arg == '--json':
+            report_path = next(args, None)
+        elif arg == '--incremental':
+            incremental = True
+        elif arg == '--fix':
+            fix = True
+        elif arg == '--dry-run':
+            fix = dry_run = True
+        else:
+            csv_path = arg
+
+    fix_report = None
+    if fix:
+        try:
+            fix_report = normalize(csv_path, dry_run=dry_run)
+        except TimeoutError as e:
+            print(f"错误：{e}")
+            return 1
+        for change in fix_report["changes"]:
+            reasons = ', '.join(FIXES[fix_id] for fix_id in change["fixes"])
+            print(f"第{change['row']}行 字段'{change['column']}': {change['before']!r} -> {change['after']!r} ({reasons})")
+        action = "已写回" if fix_report["written"] else ("未写回（--dry-run）" if dry_run else "无需写回")
+        print(f"自动修复 {len(fix_report['changes'])} 处，{action}")
+
+    # --dry-run 没有写回，校验修复后的内存结果，报告才能反映修复之后还剩哪些问题
+    table = fix_report.pop("table", None) if fix_report is not None else None
+    report = validate(csv_path, incremental=incremental, table=table)
+    if fix_report is not None:
+        report["fix"] = fix_report
+    for finding in report["findings"]:
+        print(finding["message"])
+    print(f"共 {report['rows']} 行，本次校验 {report['checked_rows']} 行：{report['errors']} 个错误，{report['warnings']} 个警告")
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,4 +1,3 @@
-import pandas as pd
 import asyncio
 import time
 from urllib.parse import urlparse
@@ -9,6 +8,8 @@ from urllib.parse import urlparse
 from playwright.async_api import async_playwright
 from bs4 import BeautifulSoup
 
+import artist_csv
+
 def chunked(lst, n):
     """将列表每n个元素分一组"""
     for i in range(0, len(lst), n):
@@ -29,17 +30,20 @@ async def process_social_platform_profiles( # Make this function async
     with open(config_path, "r", encoding="utf-8") as f:
         config_json = f.read()
 
-    # 读取数据
-    df = pd.read_csv(csv_path, dtype=str)
+    # 读取数据（CSV 未变化时直接复用解析好的快照）
+    table = artist_csv.load_table(csv_path)
+    # 行位置 -> (读取时的 URL 列原值, 需要回写的列)。新画师在生成 uni_id 之前没有 id，不能按 uni_id 对应；
+    # 回写时在文件锁内核对该位置的 URL 列仍是原值，对不上的行（期间被其他脚本增删或改动）跳过
+    updates = {}
 
     url_col = f"{platform}_url"
     name_col = f"{platform}_name"
     id_col = f"{platform}_id"
 
     grouped_rows = []
-    for idx, row in df.iterrows():
-        raw_url = row.get(url_col, "")
-        if pd.isna(raw_url) or not raw_url.strip():
+    for row_index, row in enumerate(table.rows):
+        raw_url = row.get(url_col) or ""
+        if not raw_url.strip():
             continue
 
         # 解析所有URL，并标记哪些是需要处理的（带*的）
@@ -56,7 +60,7 @@ async def process_social_platform_profiles( # Make this function async
         # 只有当存在需要抓取的URL时才加入grouped_rows
         if urls_to_scrape:
             grouped_rows.append({
-                "uni_id": row["uni_id"],
+                "row_index": row_index,
                 "original_url_column_value": raw_url, # 存储完整的原始URL字符串
                 "all_original_urls_parts": all_original_urls_parts, # 存储分割后的原始URL部分
                 "urls_to_scrape": urls_to_scrape, # 存储需要抓取的干净URL
@@ -126,10 +130,11 @@ async def process_social_platform_profiles( # Make this function async
             new_id = ";".join(id_list)     # 这里只包含被抓取URL的ID
             new_url_column_value = ";".join(updated_url_parts) # 所有URL重新组合，带*的已去除*
 
-            idx = df[df["uni_id"] == row_data["uni_id"]].index[0]
-            df.at[idx, name_col] = new_name
-            df.at[idx, id_col] = new_id
-            df.at[idx, url_col] = new_url_column_value # 更新原始的URL列
+            updates[row_data["row_index"]] = (row_data["original_url_column_value"], {
+                name_col: new_name,
+                id_col: new_id,
+                url_col: new_url_column_value # 更新原始的URL列
+            })
 
         # 等待速率限制
         # 注意：这里判断等待逻辑需要调整，因为group不再是grouped_rows的直接子列表
@@ -138,8 +143,19 @@ async def process_social_platform_profiles( # Make this function async
             print(f"等待 {rate_limit_seconds} 秒钟，准备下一批请求...")
             time.sleep(rate_limit_seconds)
 
-    # 保存结果
-    df.to_csv(csv_path, index=False, encoding="utf-8")
+    # 保存结果：抓取耗时较长，在文件锁内重新读取最新的 CSV 后只改写抓取到的行，不覆盖期间其他脚本的改动
+    with artist_csv.file_lock(csv_path):
+        fieldnames, rows = artist_csv.read_rows(csv_path)
+        skipped = 0
+        for row_index, (original_url, values) in updates.items():
+            if row_index < len(rows) and (rows[row_index].get(url_col) or "") == original_url:
+                rows[row_index].update(values)
+            else:
+                skipped += 1
+                logger.warning(f"第{row_index + 2}行 {url_col} 在抓取期间已被改动，跳过回写: {original_url}")
+        artist_csv.write_rows_atomic(csv_path, fieldnames, rows)
+    if skipped:
+        print(f"平台 {platform} 有 {skipped} 行因 CSV 在抓取期间被改动而未回写，请重新运行")
     print(f"平台 {platform} 抓取完成，数据已更新到 {csv_path}")
 
 # ... (SocialProfileScraper 和 main 函数保持不变) ...
@@ -0,0 +1,83 @@
+"""
+轮询器启动耗时基准：用 python -X importtime 在独立进程中加载各轮询器模块（不执行入口），
+统计总耗时并列出累计耗时最高的导入，用于跟踪启动路径上是否又引入了 pandas 等重量级依赖。
+
+用法（在仓库根目录运行）: python main/bench_import_time.py [重复次数] [列出的导入数]
+"""
+
+import os
+import re
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 需要跟踪启动耗时的模块：名称 -> 相对仓库根目录的路径
+TARGETS = {
+    "bili_poller": os.path.join("main", "bili_poller", "main.py"),
+    "twitter_poller": os.path.join("main", "twitter_poller", "day.py"),
+}
+
+# 出现在启动路径上即提示的重量级依赖
+HEAVY_MODULES = ("pandas", "numpy")
+
+# -X importtime 的输出行: "import time:       123 |       4567 | package.module"
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+LOADER = (
+    "import importlib.util, sys; "
+    "spec = importlib.util.spec_from_file_location('bench_target', sys.argv[1]); "
+    "module = importlib.util.module_from_spec(spec); "
+    "spec.loader.exec_module(module)"
+)
+
+
+def measure(path: str):
+    """在新进程中加载一次模块，返回 (墙钟耗时秒, [(累计微秒, 模块名, 层级)], 错误信息)"""
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", LOADER, path],
+        cwd=REPO_ROOT, capture_output=True, text=True, encoding="utf-8", errors="replace"
+    )
+    elapsed = time.perf_counter() - started
+
+    imports = []
+    errors = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            imports.append((int(match.group(2)), match.group(4), len(match.group(3)) // 2))
+        elif line.strip() and not line.startswith("import time:"):
+            errors.append(line)
+    error = errors[-1] if proc.returncode != 0 and errors else None
+    return elapsed, imports, error
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    for name, path in TARGETS.items():
+        runs = [measure(path) for _ in range(repeat)]
+        best_elapsed, imports, error = min(runs, key=lambda run: run[0])
+        print("=" * 60)
+        print(f"{name} ({path})")
+        if error:
+            print(f"  加载失败（缺少依赖或平台不支持）: {error}")
+            continue
+
+        top_level = [item for item in imports if item[2] == 0]
+        print(f"  最快一次墙钟耗时: {best_elapsed * 1000:.0f} ms（共 {repeat} 次）")
+        print(f"  顶层导入累计耗时: {sum(us for us, _, _ in top_level) / 1000:.0f} ms")
+        print(f"  累计耗时最高的 {top} 个顶层导入:")
+        for us, module, _ in sorted(top_level, reverse=True)[:top]:
+            print(f"    {us / 1000:8.1f} ms  {module}")
+
+        heavy = sorted({module.split(".")[0] for _, module, _ in imports} & set(HEAVY_MODULES))
+        if heavy:
+            print(f"  警告: 启动路径上导入了 {', '.join(heavy)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,67 +5,117 @@ Bilibili 动态采集与处理框架
 【设计特点】
 1. 模块化设计：
     - 用户管理模块负责加载和管理需要采集动态的用户数据，支持从 CSV 文件加载或手动添加用户。
-    - 动态获取模块通过 B 站 API 接口获取指定用户的动态信息，支持全量抓取和增量更新两种模式。
+    - 动态获取模块通过 B 站 API 接口获取指定用户的动态信息，支持全量抓取和增量更新两种模式；
+      动态以异步生成器逐条产出，经有界队列交给处理与下载，翻页与下载可以同时进行。
     - 动态处理模块使用工厂模式，根据动态的类型自动选择合适的处理器进行内容提取和资源下载。
     - 内容下载模块负责下载动态中的图片、视频等资源，并对下载过程进行并发控制。
     - 输出管理模块将处理结果保存到 JSON 文件，并更新 CSV 文件中的轮询时间，同时打印处理摘要。
 2. 支持多种输入源：
     - 可以通过配置 data/Artist.csv 文件批量添加用户信息，也可以使用 add_user() 方法手动添加单个用户。
 3. 两种抓取模式：
-    - 增量更新模式：基于轮询时间，只获取自上次轮询之后更新的动态，提高采集效率。
+    - 增量更新模式：基于每个用户的游标（已见过的最新动态 id 与发布时间），遇到第一条已见过的动态即停止翻页；
+      尚无游标的用户退回到按轮询时间判断。游标保存在 main/bili_poller/data/cursors.json。
     - 全量抓取模式：获取用户的所有动态信息。
 4. 动态类型处理：
     - 使用工厂模式，根据动态的类型自动选择合适的处理器，便于扩展新的动态类型处理逻辑。
 5. 可扩展性：
     - 易于添加新的动态类型处理器，只需要继承 DynamicProcessor 基类并实现相应的方法即可。
+6. 原始数据归档：
+    - 每条动态的原始 JSON 都会压缩追加到 main/bili_poller/data/raw_dynamics.db（SQLite），
+      改进处理器后可通过 replay() 离线重处理全部历史，无需重新请求 B 站。
+7. 下载清单：
+    - 已下载的资源记录在 main/bili_poller/data/download_manifest.db，全量抓取或同日重跑时只下载新资源。
+    - 文件内容按 sha256 只在下载目录的 .store 中保存一份，画师目录中的文件是指向它的硬链接，
+      重复发布或转发的同一张图不会占用额外空间。
+    - 下载进度保存在下载目录的 .partial 中，网络中断或程序重启后用 HTTP Range 从断点续传；
+      超过 16MB 的大文件（视频等）拆成多段并行下载。下载入口 ContentDownloader.download_file 与资源类型无关。
 
 【使用说明】
 1. 配置用户信息：
     - 可以选择配置 data/Artist.csv 文件，文件中应包含 bilibili_id（B站用户 ID）、bilibili_name（B站用户名）、bilibili_url（B站用户主页 URL）和 bilibili_roll_time（轮询时间，格式为 YYYY:MM:DD）等字段。
     - 也可以使用 add_user() 方法手动添加用户，该方法接受用户 ID、用户名、用户主页 URL 和轮询时间作为参数。
 2. 配置凭证信息：
-    - 在 main() 函数中，通过 load_bilibili_credential() 函数加载 B 站的凭证信息，凭证信息存储在 userdata/bilibili-cookies.json 文件中。
+    - 在 main() 函数中，通过 CredentialPool.from_cookie_files() 加载 B 站的凭证信息，凭证信息存储在 userdata/bilibili-cookies.json 文件中。
+    - 如需多个账号并行采集，可再放入 userdata/bilibili-cookies-2.json 等文件，每个账号独立限速，触发风控的账号会暂时下线。
 3. 选择抓取模式：
     - 在调用 run() 方法时，通过 full_fetch 参数选择抓取模式，full_fetch=True 表示全量抓取，full_fetch=False 表示增量抓取。
+    - 通过 concurrency 参数设置同时处理的用户数量上限。
 4. 运行脚本：
     - 在代码的最后，调用 asyncio.run(main()) 来启动采集程序。
 
 【注意事项】
-- 运行脚本前，请确保已经安装了所需的依赖库，如 pandas、bilibili_api 等。
+- 运行脚本前，请确保已经安装了所需的依赖库，如 bilibili_api、httpx 等（不依赖 pandas）；安装 h2（pip install httpx[http2]）后图片下载会使用 HTTP/2。
 - 请确保 userdata/bilibili-cookies.json 文件中包含有效的 B 站 Cookie 信息，否则可能无法正常获取动态数据。
-- 在采集过程中，为了避免对 B 站服务器造成过大压力，程序会在请求之间添加随机延迟。
+- 在采集过程中，为了避免对 B 站服务器造成过大压力，所有 API 请求与图片下载都经过按主机划分的令牌桶限速，
+  速率可在 data/config.json 的 rate_limits 中配置，例如 {"rate_limits": {"api.bilibili.com": {"rate": 1, "burst": 2}}}。
+- 图片下载的并发数按主机自适应：响应正常时逐步增加，遇到 429/5xx 或延迟升高时减半，
+  上限可在 data/config.json 的 download_host_limits 中配置，例如 {"download_host_limits": {"hdslb.com": 16}}。
+- 遇到风控返回码（-412/-352）或失败率升高时，熔断器会暂停所有 API 请求并逐次延长冷却时间；
+  失败的 (用户, offset) 会写入 main/bili_poller/data/retry_queue.json，在本次运行结束和下次运行开始时续传。
+- 每个用户处理完成后立即在画师注册表 data/Artist.db 中单点更新其轮询时间，并由注册表在文件锁（Artist.csv.lock）内
+  写回 data/Artist.csv（运行中至多每 30 秒一次，结束、出错或中断退出时再写回一次），写入临时文件后原子替换，
+  不会与 data/tools 下的脚本互相覆盖。
+- 每条动态的处理结果在处理完成时立即追加到下载目录的 results.jsonl（每行一条 JSON），程序中途退出也不会丢失。
+- 下载失败的资源会写入 main/bili_poller/data/failed_downloads.json，按指数退避在之后的运行开始时自动重试
+  （返回 404/410 的资源已被删除，只在本次的失败列表中列出，不会加入重试）；
+  也可以运行 retry_downloads_main() 只重试这些资源，不轮询任何用户。
+- data/config.json 中配置了 proxy_pool 时，图片下载逐个请求挑选代理（偏向延迟低、失败少的代理），
+  API 请求统一走一个代理并在失败时切换。
 """
 
 import asyncio
+import contextlib
+import glob
+import hashlib
+import importlib.util
+import shutil
+from collections import deque
 import json
 import os
 import logging
+import math
 import random
-import pandas as pd
+import sqlite3
+import sys
+import threading
+import zlib
+import httpx
 from datetime import datetime, time, timedelta
 from abc import ABC, abstractmethod
-from bilibili_api import user, Credential, dynamic
-from typing import List, Dict, Any, Optional
+from bilibili_api import user, Credential, dynamic, request_settings
+from bilibili_api.exceptions import ResponseCodeException
+from typing import List, Dict, Any, Callable, Optional, AsyncIterator, Iterator, Union
+from urllib.parse import urlparse, urlunparse
 
-# 配置详细日志
-log_dir = os.path.join(os.path.dirname(__file__), 'logs')
-os.makedirs(log_dir, exist_ok=True)
-log_file = os.path.join(log_dir, f"bili_harvester_{datetime.now().strftime('%Y%m%d')}.log")
+# Artist.csv 读写工具与画师注册表（Artist.csv 的 SQLite 索引）与 data/tools 下的脚本共用
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'tools'))
+import artist_csv
+from artist_registry import ArtistRegistry
 
-log_formatter = logging.Formatter(
-    '%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(funcName)s - %(message)s'
-)
-
-file_handler = logging.FileHandler(log_file, encoding='utf-8')
-file_handler.setLevel(logging.INFO)
-file_handler.setFormatter(log_formatter)
+logger = logging.getLogger(__name__)
 
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(log_formatter)
+def setup_logging():
+    """配置详细日志：写入 logs 目录下按日期命名的文件并同时输出到控制台；由入口调用，导入模块时不创建目录、不注册处理器"""
+    log_dir = os.path.join(os.path.dirname(__file__), 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    log_file = os.path.join(log_dir, f"bili_harvester_{datetime.now().strftime('%Y%m%d')}.log")
+    
+    log_formatter = logging.Formatter(
+        '%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(funcName)s - %(message)s'
+    )
+    
+    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    file_handler.setLevel(logging.INFO)
+    file_handler.setFormatter(log_formatter)
+    
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    console_handler.setFormatter(log_formatter)
+    
+    logging.basicConfig(level=logging.INFO, handlers=[file_handler, console_handler])
 
-logging.basicConfig(level=logging.INFO, handlers=[file_handler, console_handler])
-logger = logging.getLogger(__name__)
+# 持久化状态目录（游标等运行间需要保留的数据）
+state_dir = os.path.join(os.path.dirname(__file__), 'data')
 
 # 动态类型映射表
 DYNAMIC_TYPE_MAP = {
@@ -85,11 +135,78 @@ DYNAMIC_TYPE_MAP = {
     "DYNAMIC_TYPE_OGV_SEASON": "OGV更新"
 }
 
+# 单个用户获取与处理之间的缓冲队列长度（约两页动态）
+DYNAMIC_QUEUE_SIZE = 24
+
+# B站风控相关返回码：-412 请求被拦截，-352 风控校验失败
+RISK_CONTROL_CODES = {-412, -352}
+
+# 获取失败的 (用户, offset) 条目最多重试次数，超过后放弃并记录日志
+MAX_RETRY_ATTEMPTS = 5
+
+# 下载失败的资源最多重试次数；重试间隔从 10 分钟起按失败次数翻倍，最长 1 天
+MAX_DOWNLOAD_ATTEMPTS = 8
+DOWNLOAD_RETRY_BACKOFF = 600
+DOWNLOAD_RETRY_MAX_BACKOFF = 86400
+
+# B站 API 主机，动态获取请求统一按此主机限速
+BILIBILI_API_HOST = "api.bilibili.com"
+
+# 默认限速配置（rate=每秒补充的令牌数，burst=桶容量），可在 data/config.json 的 rate_limits 中覆盖
+# 键为主机名或其上级域名，如 "hdslb.com" 匹配 i0.hdslb.com / i1.hdslb.com 等图片 CDN
+DEFAULT_RATE_LIMITS = {
+    BILIBILI_API_HOST: {"rate": 3.0, "burst": 3},
+    "hdslb.com": {"rate": 5.0, "burst": 10},
+    "default": {"rate": 2.0, "burst": 2}
+}
+
+# 下载时每个主机的并发窗口上限，窗口在此范围内随 CDN 的响应情况自动伸缩，
+# 可在 data/config.json 的 download_host_limits 中覆盖
+DEFAULT_DOWNLOAD_HOST_LIMITS = {
+    "hdslb.com": 32,
+    "default": 4
+}
+
+# 下载时每次写盘的块大小，内存占用与文件大小无关
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# 超过该大小且服务器支持 Range 的文件拆成多段并行下载
+RANGE_SPLIT_THRESHOLD = 16 * 1024 * 1024
+RANGE_SEGMENTS = 4
+
+# 单个文件下载中断后在本次运行内自动续传的次数，仍失败时保留进度留待下次运行
+DOWNLOAD_RESUME_ATTEMPTS = 3
+
+# 表示资源已被删除的状态码：记入本次的失败列表，但不进入下载重试队列
+PERMANENT_STATUS_CODES = (404, 410)
+
+# httpx 的 HTTP/2 支持依赖可选的 h2 包，未安装时退回 HTTP/1.1 keep-alive
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# 每个 B 站账号各自的 API 请求速率，可在 data/config.json 的 credential_rate_limit 中覆盖；
+# 上面的 api.bilibili.com 主机限速是所有账号共享的总上限
+DEFAULT_CREDENTIAL_RATE_LIMIT = {"rate": 1.0, "burst": 2}
+
+# 触发风控的账号下线时长（秒），连续触发时翻倍，可在 data/config.json 的 credential_retire_seconds 中覆盖
+DEFAULT_CREDENTIAL_RETIRE_SECONDS = 1800
+
+# 运行中把注册表中的轮询时间写回 Artist.csv 的最小间隔（秒），退出时总会再写回一次
+CSV_EXPORT_INTERVAL = 30
+
 class UserManager:
     """用户管理类：负责加载和管理用户数据"""
     
     def __init__(self):
         self.users = []
+        self._index: Dict[int, Dict] = {}  # 用户 ID -> 用户信息，同一 ID 重复出现时以第一条为准
+    
+    def get_user(self, user_id: int) -> Optional[Dict]:
+        """按用户 ID 查找用户"""
+        return self._index.get(user_id)
+    
+    def _append(self, user_info: Dict):
+        self.users.append(user_info)
+        self._index.setdefault(user_info['id'], user_info)
     
     def load_from_csv(self, csv_file: str):
         """从CSV文件加载用户数据"""
@@ -97,14 +214,15 @@ class UserManager:
             logger.error(f"CSV文件不存在: {csv_file}")
             return
         
-        df = pd.read_csv(csv_file, dtype=str).fillna('')
-        for _, row in df.iterrows():
-            if not row.get('bilibili_id', '').strip():
+        # 解析结果带快照缓存，轮询时间已预先换算为时间戳
+        table = artist_csv.load_table(csv_file)
+        for row, roll_time in zip(table.rows, table.roll_times['bilibili']):
+            if not (row.get('bilibili_id') or '').strip():
                 continue
+            if row.get('bilibili_roll_time') and not roll_time:
+                logger.error(f"无效的时间格式: {row['bilibili_roll_time']}")
             
-            # 转换轮询时间
-            roll_time = self._convert_roll_time(row.get('bilibili_roll_time', ''))
-            self.users.append({
+            self._append({
                 'name': row.get('bilibili_name', ''),
                 'id': int(row['bilibili_id']),
                 'url': row.get('bilibili_url', ''),
@@ -117,7 +235,7 @@ class UserManager:
     def add_user(self, user_id: int, name: str = "", url: str = "", roll_time: str = ""):
         """手动添加用户"""
         roll_timestamp = self._convert_roll_time(roll_time) if roll_time else 0
-        self.users.append({
+        self._append({
             'name': name,
             'id': user_id,
             'url': url,
@@ -127,14 +245,6 @@ class UserManager:
         })
         logger.info(f"添加用户: ID={user_id}, 名称={name}")
     
-    def get_users(self, group_size: int = 5) -> List[List[Dict]]:
-        """将用户分组"""
-        groups = []
-        for i in range(0, len(self.users), group_size):
-            groups.append(self.users[i:i+group_size])
-        logger.info(f"将用户分成 {len(groups)} 组，每组最多 {group_size} 人")
-        return groups
-    
     def _convert_roll_time(self, time_str: str) -> int:
         """将YYYY:MM:DD格式转换为当日的零点时间戳"""
         try:
@@ -146,41 +256,847 @@ class UserManager:
             logger.error(f"无效的时间格式: {time_str}")
             return 0
 
+def _atomic_write_json(file_path: str, data: Any):
+    """先写入临时文件再原子替换，避免中途崩溃留下半截文件；临时文件名唯一，并发写同一文件时不会互相截断"""
+    os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+    fd, tmp_path = artist_csv.temp_beside(file_path)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_path)
+        raise
+
+class CursorStore:
+    """游标存储类：按 bilibili_id 持久化每个用户已见过的最新动态（id_str + pub_ts）"""
+    
+    def __init__(self, file_path: str = os.path.join(state_dir, 'cursors.json')):
+        self.file_path = file_path
+        self.cursors: Dict[str, Dict] = {}
+        self._load()
+    
+    def _load(self):
+        """从文件加载游标"""
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                self.cursors = json.load(f)
+            logger.info(f"已加载 {len(self.cursors)} 个用户的游标")
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"加载游标文件失败，将按轮询时间增量抓取: {str(e)}")
+            self.cursors = {}
+    
+    def get(self, user_id: int) -> Optional[Dict]:
+        """获取用户游标，不存在时返回 None"""
+        return self.cursors.get(str(user_id))
+    
+    def update(self, user_id: int, dynamic_id: str, pub_ts: int):
+        """仅当给定动态比现有游标更新时才推进游标"""
+        cursor = self.get(user_id)
+        if cursor and self.is_seen(cursor, dynamic_id, pub_ts):
+            return
+        self.cursors[str(user_id)] = {"id_str": dynamic_id, "pub_ts": pub_ts}
+    
+    def save(self):
+        """保存游标到文件"""
+        try:
+            _atomic_write_json(self.file_path, self.cursors)
+        except OSError as e:
+            logger.error(f"保存游标文件失败: {str(e)}")
+    
+    @staticmethod
+    def is_seen(cursor: Dict, dynamic_id: str, pub_ts: int) -> bool:
+        """判断动态是否不晚于游标（即已经见过）"""
+        if dynamic_id == cursor["id_str"]:
+            return True
+        if pub_ts != cursor["pub_ts"]:
+            return pub_ts < cursor["pub_ts"]
+        # 同一秒内发布的多条动态，按 id 大小区分先后
+        try:
+            return int(dynamic_id) <= int(cursor["id_str"])
+        except ValueError:
+            return False
+
+def _match_host_key(host: str, keys) -> str:
+    """按主机名、上级域名、default 的顺序查找配置键，如 i0.hdslb.com 依次匹配 i0.hdslb.com、hdslb.com"""
+    parts = host.split('.')
+    for i in range(len(parts) - 1):
+        key = '.'.join(parts[i:])
+        if key in keys:
+            return key
+    return "default"
+
+def _sha256_file(file_path: str) -> str:
+    """分块计算文件的 sha256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while chunk := f.read(DOWNLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class RawArchive:
+    """原始动态归档类：以 SQLite 追加保存每条动态的原始 JSON（zlib 压缩），用于离线重处理"""
+    
+    def __init__(self, db_path: str = os.path.join(state_dir, 'raw_dynamics.db')):
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dynamics (
+                dynamic_id TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                user_name TEXT NOT NULL DEFAULT '',
+                type TEXT NOT NULL DEFAULT '',
+                pub_ts INTEGER NOT NULL DEFAULT 0,
+                archived_at INTEGER NOT NULL,
+                raw BLOB NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_dynamics_user ON dynamics (user_id, pub_ts)")
+        self.conn.commit()
+    
+    def add(self, dynamic_data: Dict):
+        """归档一条动态，已存在的动态不会被覆盖"""
+        try:
+            raw = zlib.compress(json.dumps(dynamic_data["raw_data"], ensure_ascii=False).encode('utf-8'))
+            self.conn.execute(
+                "INSERT OR IGNORE INTO dynamics VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    dynamic_data["id"],
+                    dynamic_data["user_id"],
+                    dynamic_data.get("user_name", ""),
+                    dynamic_data.get("type", ""),
+                    dynamic_data.get("timestamp", 0),
+                    int(datetime.now().timestamp()),
+                    raw
+                )
+            )
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"归档动态 {dynamic_data.get('id')} 失败: {str(e)}")
+    
+    def get(self, dynamic_id: str) -> Optional[Dict]:
+        """按动态 ID 读取归档，不存在时返回 None"""
+        row = self.conn.execute(
+            "SELECT dynamic_id, user_id, user_name, type, pub_ts, raw FROM dynamics WHERE dynamic_id = ?",
+            (dynamic_id,)
+        ).fetchone()
+        return self._row_to_dynamic(row) if row else None
+    
+    def iter_dynamics(self, user_ids: Optional[List[int]] = None) -> Iterator[Dict]:
+        """按用户、发布时间倒序逐条读取归档的动态"""
+        sql = "SELECT dynamic_id, user_id, user_name, type, pub_ts, raw FROM dynamics"
+        params: List[Any] = []
+        if user_ids:
+            sql += f" WHERE user_id IN ({','.join('?' * len(user_ids))})"
+            params.extend(user_ids)
+        sql += " ORDER BY user_id, pub_ts DESC"
+        for row in self.conn.execute(sql, params):
+            yield self._row_to_dynamic(row)
+    
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+    
+    @staticmethod
+    def _row_to_dynamic(row) -> Dict:
+        """将数据库行还原为与 DynamicFetcher 产出一致的动态数据"""
+        dynamic_id, user_id, user_name, dyn_type, pub_ts, raw = row
+        return {
+            "user_id": user_id,
+            "user_name": user_name,
+            "id": dynamic_id,
+            "type": dyn_type,
+            "type_name": DYNAMIC_TYPE_MAP.get(dyn_type, "未知类型"),
+            "timestamp": pub_ts,
+            "raw_data": json.loads(zlib.decompress(raw).decode('utf-8'))
+        }
+
+class CircuitBreaker:
+    """
+    熔断器：统计最近请求的失败率，遇到风控返回码或失败率过高时暂停所有 API 请求。
+    连续熔断时冷却时间指数增长，请求恢复成功后逐步回落，使整体吞吐平滑降级而不是持续撞风控。
+    """
+    
+    def __init__(
+        self,
+        window: int = 20,
+        error_threshold: float = 0.5,
+        base_cooldown: float = 60,
+        max_cooldown: float = 900
+    ):
+        self.outcomes = deque(maxlen=window)
+        self.error_threshold = error_threshold
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.trips = 0
+        self.open_until = 0.0
+    
+    @staticmethod
+    def is_risk_control(error: Exception) -> bool:
+        """判断异常是否为 B 站风控（返回码 -412/-352 或 HTTP 412）"""
+        if isinstance(error, ResponseCodeException) and error.code in RISK_CONTROL_CODES:
+            return True
+        return getattr(error, 'status', None) == 412
+    
+    async def wait(self):
+        """熔断期间等待冷却结束"""
+        loop = asyncio.get_running_loop()
+        while (remaining := self.open_until - loop.time()) > 0:
+            await asyncio.sleep(remaining)
+    
+    def record_success(self):
+        """记录一次成功请求"""
+        self.outcomes.append(True)
+        if self.trips and self.outcomes.count(True) == self.outcomes.maxlen:
+            self.trips -= 1
+            self.outcomes.clear()
+    
+    def record_failure(self, error: Exception, trip_on_risk_control: bool = True) -> bool:
+        """
+        记录一次失败请求，返回是否为风控错误
+        :param trip_on_risk_control: 风控错误是否立即熔断；仍有其他健康账号可用时只计入失败率
+        """
+        self.outcomes.append(False)
+        risk_control = self.is_risk_control(error)
+        failures = self.outcomes.count(False)
+        error_rate = failures / len(self.outcomes)
+        if (risk_control and trip_on_risk_control) or (failures >= 3 and error_rate >= self.error_threshold):
+            self._trip(error_rate, risk_control)
+        return risk_control
+    
+    def _trip(self, error_rate: float, risk_control: bool):
+        """进入熔断状态"""
+        loop = asyncio.get_running_loop()
+        if loop.time() < self.open_until:
+            return
+        cooldown = min(self.max_cooldown, self.base_cooldown * (2 ** self.trips))
+        self.trips += 1
+        self.open_until = loop.time() + cooldown
+        self.outcomes.clear()
+        reason = "触发风控" if risk_control else f"失败率 {error_rate:.0%}"
+        logger.warning(f"API 熔断（{reason}），暂停所有请求 {cooldown:.0f} 秒，连续熔断 {self.trips} 次")
+
+class RetryQueue:
+    """重试队列类：持久化获取失败的 (用户, offset) 条目，在本次运行结束或下次运行开始时续传"""
+    
+    def __init__(self, file_path: str = os.path.join(state_dir, 'retry_queue.json')):
+        self.file_path = file_path
+        self.entries: Dict[str, Dict] = {}
+        self._load()
+    
+    def _load(self):
+        """从文件加载重试条目"""
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                self.entries = {self._key(e): e for e in json.load(f)}
+            logger.info(f"已加载 {len(self.entries)} 个待重试条目")
+        except (OSError, json.JSONDecodeError, KeyError) as e:
+            logger.error(f"加载重试队列失败: {str(e)}")
+            self.entries = {}
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    @staticmethod
+    def _key(entry: Dict) -> str:
+        return f"{entry['user_id']}:{entry['offset']}"
+    
+    def add(self, entry: Dict):
+        """加入或更新一个重试条目并立即落盘，超过最大重试次数的条目直接放弃"""
+        if entry["attempts"] > MAX_RETRY_ATTEMPTS:
+            logger.error(f"用户 {entry['user_name']}({entry['user_id']}) offset={entry['offset']} "
+                         f"已重试 {MAX_RETRY_ATTEMPTS} 次仍失败，放弃: {entry['last_error']}")
+            return
+        self.entries[self._key(entry)] = entry
+        self.save()
+    
+    def discard(self, entry: Dict):
+        """重试结束后移除条目；若重试期间同一位置再次失败已写入新条目，则保留新条目"""
+        key = self._key(entry)
+        if self.entries.get(key) is entry:
+            del self.entries[key]
+            self.save()
+    
+    def snapshot(self) -> List[Dict]:
+        """返回当前所有条目"""
+        return list(self.entries.values())
+    
+    def save(self):
+        """保存重试队列到文件"""
+        try:
+            _atomic_write_json(self.file_path, list(self.entries.values()))
+        except OSError as e:
+            logger.error(f"保存重试队列失败: {str(e)}")
+
+class DownloadRetryQueue:
+    """下载重试队列类：持久化下载失败的资源，按指数退避在之后的运行开始时自动重试"""
+    
+    def __init__(self, file_path: str = os.path.join(state_dir, 'failed_downloads.json')):
+        self.file_path = file_path
+        self.entries: Dict[str, Dict] = {}
+        self._load()
+    
+    def _load(self):
+        """从文件加载下载失败条目"""
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                self.entries = {e["dest_path"]: e for e in json.load(f)}
+            logger.info(f"已加载 {len(self.entries)} 个待重试下载")
+        except (OSError, json.JSONDecodeError, KeyError) as e:
+            logger.error(f"加载下载重试队列失败: {str(e)}")
+            self.entries = {}
+    
+    def __len__(self) -> int:
+        return len(self.entries)
+    
+    def add(self, url: str, dest_path: str, user_name: str, dynamic_id: str):
+        """记录一次下载失败并立即落盘，重试间隔随失败次数翻倍，超过最大次数后放弃"""
+        previous = self.entries.get(dest_path)
+        attempts = previous["attempts"] + 1 if previous else 1
+        if attempts > MAX_DOWNLOAD_ATTEMPTS:
+            logger.error(f"用户 {user_name} 动态 {dynamic_id} 的资源已重试 {MAX_DOWNLOAD_ATTEMPTS} 次仍失败，放弃: {url}")
+            self.entries.pop(dest_path, None)
+        else:
+            backoff = min(DOWNLOAD_RETRY_BACKOFF * 2 ** (attempts - 1), DOWNLOAD_RETRY_MAX_BACKOFF)
+            self.entries[dest_path] = {
+                "url": url,
+                "dest_path": dest_path,
+                "user_name": user_name,
+                "dynamic_id": dynamic_id,
+                "attempts": attempts,
+                "next_retry_at": datetime.now().timestamp() + backoff
+            }
+        self.save()
+    
+    def discard(self, dest_path: str):
+        """下载成功或资源已不存在时移除条目"""
+        if self.entries.pop(dest_path, None) is not None:
+            self.save()
+    
+    def due(self, ignore_backoff: bool = False) -> List[Dict]:
+        """返回已到重试时间的条目"""
+        now = datetime.now().timestamp()
+        return [e for e in self.entries.values() if ignore_backoff or e["next_retry_at"] <= now]
+    
+    def save(self):
+        """保存下载重试队列到文件"""
+        try:
+            _atomic_write_json(self.file_path, list(self.entries.values()))
+        except OSError as e:
+            logger.error(f"保存下载重试队列失败: {str(e)}")
+
+class DownloadManifest:
+    """
+    下载清单类：记录每个已下载资源的 规范化 URL -> 本地路径、大小、sha256。
+    以 SQLite 持久化，下载前按主键索引查询单条记录（不产生网络请求），整张清单不常驻内存。
+    """
+    
+    def __init__(self, db_path: str = os.path.join(state_dir, 'download_manifest.db')):
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS downloads (
+                url TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                sha256 TEXT NOT NULL,
+                downloaded_at INTEGER NOT NULL
+            )
+            """
+        )
+        self.conn.commit()
+    
+    @staticmethod
+    def normalize_url(url: str) -> str:
+        """规范化 URL：统一 https、小写主机名，去掉查询参数与锚点"""
+        parsed = urlparse(url)
+        return urlunparse(("https", (parsed.hostname or "").lower(), parsed.path, "", "", ""))
+    
+    def lookup(self, url: str) -> Optional[Dict]:
+        """
+        查询资源的下载记录 {"path", "size", "sha256"}，不存在时返回 None。
+        不检查记录的本地文件是否仍存在：文件被移走时内容可能还在内容寻址存储中，由调用方决定从哪里复用
+        """
+        row = self.conn.execute(
+            "SELECT path, size, sha256 FROM downloads WHERE url = ?", (self.normalize_url(url),)
+        ).fetchone()
+        return {"path": row[0], "size": row[1], "sha256": row[2]} if row else None
+    
+    def record(self, url: str, path: str, size: int, sha256: str):
+        """记录一次成功下载"""
+        key = self.normalize_url(url)
+        try:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?)",
+                (key, path, size, sha256, int(datetime.now().timestamp()))
+            )
+            self.conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"写入下载清单失败: {url} 错误: {str(e)}")
+    
+    def close(self):
+        """关闭数据库连接"""
+        self.conn.close()
+
+class BlobStore:
+    """
+    内容寻址存储：每份内容按 sha256 只在 <base_dir>/.store 中保存一次，
+    各画师 {type}-{dynamic_id} 目录中的文件是指向它的硬链接（文件系统不支持硬链接时退回复制）。
+    """
+    
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.dedup_count = 0
+    
+    def blob_path(self, sha256: str) -> str:
+        """内容对应的存储路径，按哈希前两位分目录"""
+        return os.path.join(self.root, sha256[:2], sha256)
+    
+    def put(self, tmp_path: str, sha256: str) -> str:
+        """将已下载的临时文件收入存储；内容已存在时丢弃临时文件，不再重复写入"""
+        blob_path = self.blob_path(sha256)
+        if os.path.isfile(blob_path):
+            os.remove(tmp_path)
+            self.dedup_count += 1
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(tmp_path, blob_path)
+        return blob_path
+    
+    def link(self, blob_path: str, dest_path: str):
+        """在目标位置创建指向存储内容的硬链接，先链接到临时名再原子替换"""
+        if os.path.exists(dest_path) and os.path.samefile(blob_path, dest_path):
+            return
+        tmp_path = f"{dest_path}.link"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        try:
+            os.link(blob_path, tmp_path)
+        except OSError:
+            shutil.copyfile(blob_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+
+class TokenBucket:
+    """令牌桶：按固定速率补充令牌，最多积攒 burst 个令牌用于突发请求"""
+    
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.updated = None
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        """取一个令牌，令牌不足时等待补充"""
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            while True:
+                now = loop.time()
+                if self.updated is not None:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class RateLimiter:
+    """全局限速器：按主机维护令牌桶，动态获取与内容下载共用"""
+    
+    def __init__(self, limits: Optional[Dict[str, Dict]] = None):
+        self.limits = {**DEFAULT_RATE_LIMITS, **(limits or {})}
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.request_counts: Dict[str, int] = {}
+    
+    async def acquire(self, url_or_host: str):
+        """按 URL 或主机名获取一个请求令牌"""
+        host = urlparse(url_or_host).hostname if "://" in url_or_host else url_or_host
+        key = _match_host_key(host or "", self.limits)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            limit = self.limits[key]
+            bucket = self.buckets[key] = TokenBucket(float(limit["rate"]), float(limit.get("burst", 1)))
+        await bucket.acquire()
+        self.request_counts[key] = self.request_counts.get(key, 0) + 1
+
+class AdaptiveWindow:
+    """
+    自适应并发窗口（AIMD）：请求正常且响应延迟稳定时窗口缓慢增大（每轮约 +1），
+    遇到 429/5xx、连接错误或首字节延迟明显高于基线时减半，每个基线延迟周期内最多减半一次。
+    基线取最近 baseline_samples 次延迟的低分位数（而不是历史最低值），CDN 正常的延迟抖动不会被误判为拥塞；
+    基线下降立即生效，上升则每秒最多增长 baseline_growth（指数衰减），持续排队造成的延迟缓慢爬升不会被基线"吸收"，
+    而 CDN 节点切换等延迟整体变化后基线也能在数十秒内跟上。
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        max_window: int,
+        initial_window: int = 2,
+        min_window: int = 1,
+        latency_factor: float = 2.0,
+        alpha: float = 0.125,
+        baseline_samples: int = 300,
+        baseline_percentile: float = 0.3,
+        baseline_growth: float = 0.05,
+        min_samples: int = 8,
+        clock: Optional[Callable[[], float]] = None
+    ):
+        self.name = name
+        self.max_window = max(min_window, max_window)
+        self.min_window = min_window
+        self.window = float(min(max(initial_window, min_window), self.max_window))
+        self.latency_factor = latency_factor
+        self.alpha = alpha
+        self.baseline_percentile = baseline_percentile
+        self.baseline_growth = baseline_growth
+        self.min_samples = min_samples
+        self.clock = clock
+        self.in_flight = 0
+        self.latency: Optional[float] = None  # 首字节延迟的 EWMA
+        self.samples: deque = deque(maxlen=baseline_samples)  # 最近的延迟样本，用于计算基线
+        self.base_latency: Optional[float] = None  # 最近样本的低分位数，作为基线
+        self.base_updated: Optional[float] = None
+        self.decreases = 0
+        self.last_decrease = None
+        self._cond = asyncio.Condition()
+    
+    async def acquire(self):
+        """占用一个并发名额，窗口已满时等待"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.window))
+            self.in_flight += 1
+    
+    def observe_latency(self, latency: float):
+        """记录一次首字节延迟"""
+        self.latency = latency if self.latency is None else self.alpha * latency + (1 - self.alpha) * self.latency
+        self.samples.append(latency)
+        ordered = sorted(self.samples)
+        percentile = ordered[int((len(ordered) - 1) * self.baseline_percentile)]
+        now = self._now()
+        if self.base_latency is None or percentile <= self.base_latency:
+            self.base_latency = percentile
+        else:
+            growth = math.exp(self.baseline_growth * (now - self.base_updated))
+            self.base_latency = min(percentile, self.base_latency * growth)
+        self.base_updated = now
+    
+    def _now(self) -> float:
+        return self.clock() if self.clock else asyncio.get_running_loop().time()
+    
+    def _latency_congested(self) -> bool:
+        """平滑后的延迟是否明显高于基线（样本太少时不判断）"""
+        return (
+            len(self.samples) >= self.min_samples
+            and self.latency > self.latency_factor * self.base_latency
+        )
+    
+    async def release(self, congested: bool = False):
+        """释放名额并按本次结果调整窗口：congested 表示被限流或出错"""
+        async with self._cond:
+            self.in_flight -= 1
+            if not congested and self._latency_congested():
+                congested = True
+            old_window = self.window
+            if congested:
+                now = self._now()
+                # 每个基线延迟周期内最多减半一次，同一批受影响的请求只算一次拥塞
+                if self.last_decrease is None or now - self.last_decrease >= (self.base_latency or 1.0):
+                    self.window = max(float(self.min_window), self.window / 2)
+                    self.last_decrease = now
+                    self.decreases += 1
+            else:
+                self.window = min(float(self.max_window), self.window + 1 / self.window)
+            
+            if int(self.window) < int(old_window):
+                logger.info(f"主机 {self.name} 下载并发窗口收缩: {int(old_window)} -> {int(self.window)}")
+            elif int(self.window) > int(old_window):
+                logger.debug(f"主机 {self.name} 下载并发窗口扩大: {int(old_window)} -> {int(self.window)}")
+            self._cond.notify_all()
+    
+    def summary(self) -> Dict[str, Any]:
+        """当前窗口状态，用于日志"""
+        return {
+            "window": int(self.window),
+            "max_window": self.max_window,
+            "in_flight": self.in_flight,
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "decreases": self.decreases
+        }
+
+class ProxyManager:
+    """
+    代理管理类：复用 data/config.json 中的 proxy_pool，记录每个代理的延迟与失败率（指数滑动平均），
+    按"越快、越稳定权重越高"的方式随机挑选，使请求分散到多个出口 IP 上。
+    从未用过的代理优先试用一次；失败率接近 1 的代理只保留很小的权重，恢复后还能重新被选中。
+    """
+    
+    def __init__(self, proxy_pool: Optional[List[Dict]] = None, alpha: float = 0.3):
+        self.alpha = alpha
+        self.stats: Dict[str, Dict] = {}
+        for proxy in proxy_pool or []:
+            proxy_url = proxy.get("https") or proxy.get("http")
+            if proxy_url:
+                self.stats[proxy_url] = {"latency": None, "fail_rate": 0.0, "requests": 0, "failures": 0}
+        self.api_proxy: Optional[str] = None
+        self._lock = threading.Lock()
+    
+    def choose(self, exclude: Optional[str] = None) -> Optional[str]:
+        """挑选一个代理，没有配置代理时返回 None（直连）"""
+        with self._lock:
+            candidates = [url for url in self.stats if url != exclude] or list(self.stats)
+            if not candidates:
+                return None
+            # 从未用过的代理优先试用一次，以获得延迟与失败率数据
+            untried = [url for url in candidates if self.stats[url]["requests"] == 0]
+            if untried:
+                return random.choice(untried)
+            # 用过但从未成功的代理没有延迟数据，按已知代理中最慢的延迟计
+            known = [self.stats[url]["latency"] for url in candidates if self.stats[url]["latency"] is not None]
+            default_latency = max(known) if known else 1.0
+            weights = []
+            for url in candidates:
+                stat = self.stats[url]
+                latency = stat["latency"] if stat["latency"] is not None else default_latency
+                weights.append(max(1 - stat["fail_rate"], 0.02) / (latency + 0.01))
+            return random.choices(candidates, weights)[0]
+    
+    def report(self, proxy_url: Optional[str], ok: bool, latency: Optional[float] = None):
+        """记录一次请求结果"""
+        if proxy_url not in self.stats:
+            return
+        with self._lock:
+            stat = self.stats[proxy_url]
+            stat["requests"] += 1
+            stat["fail_rate"] = (1 - self.alpha) * stat["fail_rate"] + self.alpha * (0.0 if ok else 1.0)
+            if not ok:
+                stat["failures"] += 1
+            if latency is not None:
+                stat["latency"] = latency if stat["latency"] is None else (
+                    (1 - self.alpha) * stat["latency"] + self.alpha * latency
+                )
+    
+    def rotate_api_proxy(self):
+        """
+        切换 API 请求使用的代理。
+        bilibili_api 的代理是全局设置，并发请求无法逐个指定，因此 API 始终只走一个代理，在失败时切换。
+        """
+        if not self.stats:
+            return
+        self.api_proxy = self.choose(exclude=self.api_proxy)
+        request_settings.set_proxy(self.api_proxy)
+        logger.info(f"API 请求切换到代理: {self.api_proxy}")
+    
+    def summary(self) -> Dict[str, Dict]:
+        """各代理的统计信息，用于日志"""
+        with self._lock:
+            return {url: dict(stat) for url, stat in self.stats.items()}
+
+class CredentialSlot:
+    """凭证池中的单个账号：持有凭证、独立的请求令牌桶与健康状态"""
+    
+    def __init__(self, name: str, credential: Credential, pool: "CredentialPool", rate: float, burst: float):
+        self.name = name
+        self.credential = credential
+        self.pool = pool
+        self.bucket = TokenBucket(rate, burst)
+        self.in_flight = 0
+        self.assigned = 0
+        self.strikes = 0
+        self.retired_until = 0.0
+    
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.retired_until
+
+class CredentialPool:
+    """凭证池：从多个 Cookie 文件加载账号，用户分摊到健康账号上，触发风控的账号暂时下线"""
+    
+    def __init__(
+        self,
+        credentials: Dict[str, Credential],
+        rate_limit: Optional[Dict] = None,
+        retire_seconds: float = DEFAULT_CREDENTIAL_RETIRE_SECONDS
+    ):
+        if not credentials:
+            raise ValueError("凭证池至少需要一个凭证")
+        limit = rate_limit or DEFAULT_CREDENTIAL_RATE_LIMIT
+        self.slots = [
+            CredentialSlot(name, credential, self, float(limit["rate"]), float(limit.get("burst", 1)))
+            for name, credential in credentials.items()
+        ]
+        self.retire_seconds = retire_seconds
+    
+    @classmethod
+    def from_cookie_files(cls, pattern: str = "userdata/bilibili-cookies*.json", config: Optional[Dict] = None) -> "CredentialPool":
+        """加载所有匹配的 Cookie 文件，单个文件加载失败时跳过"""
+        config = config or {}
+        credentials = {}
+        for cookies_path in sorted(glob.glob(pattern)):
+            try:
+                credentials[os.path.basename(cookies_path)] = load_bilibili_credential(cookies_path)
+            except Exception:
+                continue
+        logger.info(f"凭证池加载 {len(credentials)} 个账号: {list(credentials)}")
+        return cls(
+            credentials,
+            config.get("credential_rate_limit"),
+            config.get("credential_retire_seconds", DEFAULT_CREDENTIAL_RETIRE_SECONDS)
+        )
+    
+    def has_healthy(self) -> bool:
+        """是否还有未下线的账号"""
+        now = asyncio.get_running_loop().time()
+        return any(slot.is_healthy(now) for slot in self.slots)
+    
+    async def acquire(self) -> CredentialSlot:
+        """为一个用户分配账号：优先选择健康且当前负载最低的账号，全部下线时等待最早恢复的账号"""
+        loop = asyncio.get_running_loop()
+        while True:
+            now = loop.time()
+            healthy = [slot for slot in self.slots if slot.is_healthy(now)]
+            if healthy:
+                slot = min(healthy, key=lambda s: (s.in_flight, s.assigned))
+                slot.in_flight += 1
+                slot.assigned += 1
+                return slot
+            wait_seconds = min(slot.retired_until for slot in self.slots) - now
+            logger.warning(f"所有账号均已下线，等待 {wait_seconds:.0f} 秒")
+            await asyncio.sleep(wait_seconds)
+    
+    def release(self, slot: CredentialSlot):
+        """用户处理结束后归还账号"""
+        slot.in_flight -= 1
+    
+    def retire(self, slot: CredentialSlot):
+        """账号触发风控，暂时下线；连续触发时下线时间翻倍"""
+        now = asyncio.get_running_loop().time()
+        if not slot.is_healthy(now):
+            return
+        seconds = self.retire_seconds * (2 ** min(slot.strikes, 4))
+        slot.strikes += 1
+        slot.retired_until = now + seconds
+        logger.warning(f"账号 {slot.name} 触发风控，下线 {seconds:.0f} 秒")
+
 class DynamicFetcher:
     """动态获取类：负责获取用户动态"""
     
-    def __init__(self, credential: Credential):
-        self.credential = credential
+    def __init__(
+        self,
+        credential: Credential,
+        cursor_store: Optional[CursorStore] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        retry_queue: Optional[RetryQueue] = None,
+        credential_slot: Optional[CredentialSlot] = None,
+        proxy_manager: Optional[ProxyManager] = None
+    ):
+        self.credential = credential_slot.credential if credential_slot else credential
+        self.credential_slot = credential_slot
+        self.proxy_manager = proxy_manager or ProxyManager()
+        self.cursor_store = cursor_store
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.retry_queue = retry_queue
     
     async def fetch_user_dynamics(
         self, 
         user_info: Dict, 
         full_fetch: bool = False,
     ) -> List[Dict]:
+        """获取用户动态并汇总为列表（采集流程使用 iter_user_dynamics 边翻页边处理）"""
+        return [dynamic_data async for dynamic_data in self.iter_user_dynamics(user_info, full_fetch)]
+    
+    async def iter_user_dynamics(
+        self,
+        user_info: Dict,
+        full_fetch: bool = False,
+        retry_entry: Optional[Dict] = None,
+    ) -> AsyncIterator[Dict]:
         """
-        获取用户动态
+        逐条产出用户动态，翻页与下游处理可以重叠进行
         :param full_fetch: True=获取全部动态, False=仅获取更新
+        :param retry_entry: 重试队列条目，传入时从条目记录的 offset 续传，并沿用失败时的停止条件
+        增量模式优先使用游标（遇到第一条已见过的动态即停止），没有游标时才退回到按轮询时间判断。
+        某一页请求失败时，会把 (用户, offset) 写入重试队列，之后从该页续传。
         """
         uid = user_info['id']
         name = user_info['name']
-        since_timestamp = 0 if full_fetch else user_info['roll_time']
+        if retry_entry:
+            full_fetch = retry_entry["full_fetch"]
+            since_timestamp = retry_entry["since_ts"]
+            cursor = retry_entry["cursor"]
+        else:
+            since_timestamp = 0 if full_fetch else user_info.get('roll_time', 0)
+            cursor = self.cursor_store.get(uid) if self.cursor_store and not full_fetch else None
         
-        since_str = datetime.fromtimestamp(since_timestamp).strftime("%Y-%m-%d %H:%M:%S") if since_timestamp else "起始"
+        if cursor:
+            since_str = f"游标 {cursor['id_str']}({datetime.fromtimestamp(cursor['pub_ts']).strftime('%Y-%m-%d %H:%M:%S')})"
+        else:
+            since_str = datetime.fromtimestamp(since_timestamp).strftime("%Y-%m-%d %H:%M:%S") if since_timestamp else "起始"
         logger.info(f"开始获取用户 {name}({uid}) 的动态，模式: {'全量' if full_fetch else '增量'}, 起始时间: {since_str}")
         
         u = user.User(uid, credential=self.credential)
-        all_dynamics = []
-        offset = ""
+        count = 0
+        offset = retry_entry["offset"] if retry_entry else ""
         page = 0
         has_more = True
         
         try:
             while has_more:
                 page += 1
-                await asyncio.sleep(random.uniform(1, 3))  # 随机延迟
+                await self.circuit_breaker.wait()
+                if self.credential_slot:
+                    await self.credential_slot.bucket.acquire()
+                await self.rate_limiter.acquire(BILIBILI_API_HOST)
                 
                 logger.debug(f"请求用户 {name} 第 {page} 页动态，offset={offset}")
-                dynamics = await u.get_dynamics_new(offset)
+                api_proxy = self.proxy_manager.api_proxy
+                started = asyncio.get_running_loop().time()
+                try:
+                    dynamics = await u.get_dynamics_new(offset)
+                except Exception as e:
+                    self.proxy_manager.report(api_proxy, ok=False)
+                    if api_proxy and api_proxy == self.proxy_manager.api_proxy:
+                        self.proxy_manager.rotate_api_proxy()
+                    pool = self.credential_slot.pool if self.credential_slot else None
+                    if pool and CircuitBreaker.is_risk_control(e):
+                        pool.retire(self.credential_slot)
+                    # 仍有其他健康账号时，单个账号风控只下线该账号，不暂停全部请求
+                    risk_control = self.circuit_breaker.record_failure(
+                        e, trip_on_risk_control=not (pool and pool.has_healthy())
+                    )
+                    logger.error(f"获取用户 {name} 第 {page} 页动态失败{'（风控）' if risk_control else ''}，"
+                                 f"已加入重试队列: {str(e)}")
+                    if self.retry_queue is not None:
+                        self.retry_queue.add({
+                            "user_id": uid,
+                            "user_name": name,
+                            "offset": offset,
+                            "full_fetch": full_fetch,
+                            "since_ts": since_timestamp,
+                            "cursor": cursor,
+                            "attempts": retry_entry["attempts"] + 1 if retry_entry else 1,
+                            "last_error": str(e)
+                        })
+                    break
+                self.circuit_breaker.record_success()
+                self.proxy_manager.report(api_proxy, ok=True, latency=asyncio.get_running_loop().time() - started)
                 
                 if not dynamics or "items" not in dynamics or not dynamics["items"]:
                     logger.info(f"用户 {name} 第 {page} 页无数据，停止翻页")
@@ -196,18 +1112,24 @@ class DynamicFetcher:
                         logger.warning(f"动态缺少pub_ts，使用当前时间")
                         timestamp = int(datetime.now().timestamp())
                     
-                    # 增量模式且动态时间早于起始时间，停止翻页
-                    if not full_fetch and timestamp <= since_timestamp:
-                        timestamp_str = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
-                        logger.info(f"用户 {name} 遇到旧动态(<= {since_str})，停止翻页")
-                        has_more = False
-                        break
-                    
-                    if not has_more:
-                        break
-
                     dynamic_id = item.get("id_str", str(item.get("id", "")))
-                    all_dynamics.append({
+                    
+                    # 增量模式且动态已见过（或早于起始时间），停止翻页
+                    if not full_fetch:
+                        if cursor:
+                            is_old = CursorStore.is_seen(cursor, dynamic_id, timestamp)
+                        else:
+                            is_old = timestamp <= since_timestamp
+                        if is_old:
+                            # 置顶动态不按时间排序，跳过而不是停止翻页
+                            if item.get("modules", {}).get("module_tag", {}).get("text") == "置顶":
+                                continue
+                            logger.info(f"用户 {name} 遇到旧动态(<= {since_str})，停止翻页")
+                            has_more = False
+                            break
+                    
+                    count += 1
+                    yield {
                         "user_id": uid,
                         "user_name": name,
                         "id": dynamic_id,
@@ -215,7 +1137,7 @@ class DynamicFetcher:
                         "type_name": DYNAMIC_TYPE_MAP.get(item.get("type", ""), "未知类型"),
                         "timestamp": timestamp,
                         "raw_data": item
-                    })
+                    }
                 
                 # 检查是否还有更多
                 if has_more:
@@ -226,8 +1148,7 @@ class DynamicFetcher:
         except Exception as e:
             logger.error(f"获取用户 {name} 动态失败: {str(e)}")
         
-        logger.info(f"用户 {name} 共获取到 {len(all_dynamics)} 条动态，共翻了 {page} 页")
-        return all_dynamics    
+        logger.info(f"用户 {name} 共获取到 {count} 条动态，共翻了 {page} 页")
 
 class DynamicProcessor(ABC):
     """动态处理器基类"""
@@ -313,7 +1234,8 @@ class DrawProcessor(DynamicProcessor):
         except Exception as e:
             logger.error(f"提取图片URL失败: {str(e)}")
         
-        return list(set(image_urls))
+        # 去重并保持顺序，保证同一动态每次运行生成的文件序号一致
+        return list(dict.fromkeys(image_urls))
 
 class VideoProcessor(DynamicProcessor):
     """视频动态处理器"""
@@ -403,138 +1325,592 @@ class ProcessorFactory:
         else:
             return DefaultProcessor(dynamic_data)
 
+class DownloadGoneError(Exception):
+    """资源已不存在（PERMANENT_STATUS_CODES），重试不会成功"""
+
 class ContentDownloader:
-    """内容下载类"""
+    """内容下载类：使用长连接复用的异步 HTTP 客户端（每个代理一个连接池），按主机自适应调整并发数"""
     
-    def __init__(self, base_dir: str = "C:/Users/Ryimi/Downloads/bilibili"):
+    def __init__(
+        self,
+        base_dir: str = "C:/Users/Ryimi/Downloads/bilibili",
+        rate_limiter: Optional[RateLimiter] = None,
+        proxy_manager: Optional[ProxyManager] = None,
+        host_limits: Optional[Dict[str, int]] = None,
+        manifest: Optional[DownloadManifest] = None,
+        retry_queue: Optional[DownloadRetryQueue] = None
+    ):
         self.base_dir = base_dir
         os.makedirs(base_dir, exist_ok=True)
         self.failed_downloads = []
-        self.semaphore = asyncio.Semaphore(5)  # 并发控制
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.proxy_manager = proxy_manager or ProxyManager()
+        self.host_limits = {**DEFAULT_DOWNLOAD_HOST_LIMITS, **(host_limits or {})}
+        self.host_windows: Dict[str, AdaptiveWindow] = {}
+        self._clients: Dict[Optional[str], httpx.AsyncClient] = {}
+        self.manifest = manifest or DownloadManifest()
+        self.retry_queue = retry_queue if retry_queue is not None else DownloadRetryQueue()
+        self.blob_store = BlobStore(os.path.join(base_dir, ".store"))
+        self.partial_dir = os.path.join(base_dir, ".partial")
+        os.makedirs(self.partial_dir, exist_ok=True)
+        # 进行中的下载（按规范化 URL 的哈希），同一 URL 的并发请求共用一次下载
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.skipped_count = 0
+    
+    def _get_client(self, proxy_url: Optional[str]) -> httpx.AsyncClient:
+        """获取（必要时创建）指定代理对应的连接池客户端，None 表示直连"""
+        client = self._clients.get(proxy_url)
+        if client is None:
+            client = self._clients[proxy_url] = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                proxy=proxy_url,
+                timeout=httpx.Timeout(10.0),
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=32),
+                follow_redirects=True
+            )
+        return client
+    
+    def _host_window(self, url: str) -> AdaptiveWindow:
+        """获取 URL 所在主机的自适应并发窗口"""
+        key = _match_host_key(urlparse(url).hostname or "", self.host_limits)
+        window = self.host_windows.get(key)
+        if window is None:
+            window = self.host_windows[key] = AdaptiveWindow(key, int(self.host_limits[key]))
+        return window
+    
+    @contextlib.asynccontextmanager
+    async def _host_slot(self, url: str) -> AsyncIterator[AdaptiveWindow]:
+        """在主机并发窗口内执行一次请求，被限流（429/5xx）或连接出错时通知窗口收缩"""
+        window = self._host_window(url)
+        await window.acquire()
+        congested = False
+        try:
+            yield window
+        except (httpx.TransportError, httpx.HTTPStatusError):
+            congested = True
+            raise
+        finally:
+            await window.release(congested)
+    
+    async def aclose(self):
+        """关闭所有连接池"""
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
     
     async def download_images(self, user_name: str, dynamic_id: str, image_urls: List[str], dynamic_type: str = "draw") -> bool:
         """下载图片"""
         if not image_urls:
             return False
         
-        async with self.semaphore:
-            # 随机延迟防止高并发
-            await asyncio.sleep(random.uniform(0.5, 2.0))
-            return await asyncio.get_event_loop().run_in_executor(
-                None, self._download_images_sync, user_name, dynamic_id, image_urls, dynamic_type
-            )
-    
-    def _download_images_sync(self, user_name: str, dynamic_id: str, image_urls: List[str], dynamic_type: str) -> bool:
-        """同步下载图片"""
         try:
-            import requests
-
             # 创建用户目录
-            user_dir = os.path.join(self.base_dir, user_name.replace('/', '_').replace('\\', '_'))
-            os.makedirs(user_dir, exist_ok=True)
+            safe_name = user_name.replace('/', '_').replace('\\', '_')
+            user_dir = os.path.join(self.base_dir, safe_name)
             # 创建类型-id 目录
             type_id_dir = os.path.join(user_dir, f"{dynamic_type}-{dynamic_id}")
             os.makedirs(type_id_dir, exist_ok=True)
-            
-            success = False
-            for idx, url in enumerate(image_urls, 1):
-                ext = os.path.splitext(url)[1].split('?')[0] or '.jpg'
-                safe_name = user_name.replace('/', '_').replace('\\', '_')
-                img_path = os.path.join(type_id_dir, f"{safe_name}_{dynamic_id}_{idx}{ext}")
+        except OSError as e:
+            logger.error(f"保存图片失败: {str(e)}")
+            return False
+        
+        tasks = []
+        for idx, url in enumerate(image_urls, 1):
+            ext = os.path.splitext(url)[1].split('?')[0] or '.jpg'
+            img_path = os.path.join(type_id_dir, f"{safe_name}_{dynamic_id}_{idx}{ext}")
+            tasks.append(self._download_image(user_name, dynamic_id, url, img_path))
+        
+        # 每张图片是独立的下载任务，并发数由各主机的自适应窗口控制，多图动态的耗时约等于最慢的一张
+        results = await asyncio.gather(*tasks)
+        return any(results)
+    
+    async def _download_image(self, user_name: str, dynamic_id: str, url: str, img_path: str) -> bool:
+        """下载单张图片，失败时写入下载重试队列"""
+        # 清单中已有的资源不再请求网络
+        if self._reuse_existing(url, img_path):
+            self.retry_queue.discard(img_path)
+            return True
+        
+        try:
+            downloaded = await self.download_file(url, img_path)
+        except DownloadGoneError as e:
+            # 资源已被删除，重试也不会成功：只记入本次的失败列表，并移出重试队列
+            logger.warning(str(e))
+            self.failed_downloads.append((dynamic_id, user_name, url))
+            self.retry_queue.discard(img_path)
+            return False
+        if downloaded:
+            logger.info(f"图片已保存: {img_path}")
+            self.retry_queue.discard(img_path)
+            return True
+        self.failed_downloads.append((dynamic_id, user_name, url))
+        self.retry_queue.add(url, img_path, user_name, dynamic_id)
+        return False
+    
+    async def retry_failed_downloads(self, ignore_backoff: bool = False) -> int:
+        """
+        重试下载重试队列中已到时间的资源，成功的移出队列，失败的推迟下次重试
+        :param ignore_backoff: 忽略退避时间，重试队列中的全部条目
+        :return: 本次重试成功的数量
+        """
+        entries = self.retry_queue.due(ignore_backoff)
+        if not entries:
+            return 0
+        logger.info(f"重试 {len(entries)} 个下载失败的资源（队列共 {len(self.retry_queue)} 个）")
+        results = await asyncio.gather(*(
+            self._download_image(e["user_name"], e["dynamic_id"], e["url"], e["dest_path"]) for e in entries
+        ))
+        logger.info(f"下载重试完成: 成功 {sum(results)} 个，仍失败 {len(results) - sum(results)} 个")
+        return sum(results)
+    
+    def _reuse_existing(self, url: str, img_path: str) -> bool:
+        """
+        资源已下载过时直接复用：目标文件已在则跳过，否则链接到已有内容（如转发同一张图）。
+        清单记录的文件被删除或移走时，只要内容仍在存储中，就从存储重新链接而不是重新下载
+        """
+        entry = self.manifest.lookup(url)
+        if not entry:
+            return False
+        try:
+            blob_path = self.blob_store.blob_path(entry["sha256"])
+            source = next((
+                path for path in (blob_path, entry["path"])
+                if os.path.isfile(path) and os.path.getsize(path) == entry["size"]
+            ), None)
+            if source is None:
+                return False
+            if not (os.path.isfile(img_path) and os.path.getsize(img_path) == entry["size"]):
+                os.makedirs(os.path.dirname(img_path), exist_ok=True)
+                self.blob_store.link(source, img_path)
+            if source is blob_path and not os.path.isfile(entry["path"]):
+                # 记录的路径已失效，改记为本次链接的位置
+                self.manifest.record(url, img_path, entry["size"], entry["sha256"])
+        except OSError as e:
+            logger.warning(f"复用已下载文件失败，重新下载: {img_path} 错误: {str(e)}")
+            return False
+        self.skipped_count += 1
+        logger.debug(f"图片已存在，跳过下载: {img_path}")
+        return True
+    
+    async def download_file(self, url: str, dest_path: str) -> bool:
+        """
+        下载任意资源到 dest_path，是各类资源（图片、视频、专栏配图等）共用的下载入口。
+        - 进度持久化在 <base_dir>/.partial 中，中断（异常或进程重启）后用 HTTP Range 从断点续传；
+        - 超过 RANGE_SPLIT_THRESHOLD 且服务器支持 Range 的大文件拆成多段并行下载；
+        - 下载完成的内容收入内容寻址存储，dest_path 是指向它的链接，并记入下载清单；
+        - 同一 URL 同时只下载一次（如两条动态中的同一张图、重试与本轮同时下载），后到的调用等待其结果后直接链接。
+        资源已被删除（404/410）时抛出 DownloadGoneError，与可重试的失败（返回 False）区分。
+        """
+        key = self._partial_key(url)
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            inflight = self._inflight[key] = asyncio.get_running_loop().create_future()
+            try:
+                blob = await self._download_blob(url)
+            except DownloadGoneError as e:
+                inflight.set_result(e)
+                raise
+            except BaseException:
+                inflight.set_result(None)
+                raise
+            else:
+                inflight.set_result(blob)
+            finally:
+                del self._inflight[key]
+        else:
+            blob = await asyncio.shield(inflight)
+            if isinstance(blob, DownloadGoneError):
+                raise DownloadGoneError(*blob.args)
+        if blob is None:
+            return False
+        
+        blob_path, size, sha256 = blob
+        try:
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            self.blob_store.link(blob_path, dest_path)
+        except OSError as e:
+            logger.error(f"保存文件失败: {dest_path} 错误: {str(e)}")
+            return False
+        self.manifest.record(url, dest_path, size, sha256)
+        return True
+    
+    async def _download_blob(self, url: str) -> Optional[tuple]:
+        """下载资源并收入内容寻址存储，返回 (存储路径, 大小, sha256)，失败返回 None（进度保留供续传）"""
+        part_path, state_path = self._partial_paths(url)
+        state = self._load_partial_state(url, part_path, state_path)
+        
+        for attempt in range(1, DOWNLOAD_RESUME_ATTEMPTS + 1):
+            try:
+                if not state.get("segments"):
+                    try:
+                        fetched = await self._fetch_stream(url, part_path, state_path, state)
+                    except DownloadGoneError:
+                        self._discard_partial(part_path, state_path)
+                        raise
+                    if not fetched:
+                        self._discard_partial(part_path, state_path)
+                        return None
+                if state.get("segments"):
+                    await self._fetch_segments(url, part_path, state_path, state)
                 
-                try:
-                    resp = requests.get(url, timeout=10)
+                # 分段下载预先把文件截断到了完整大小，文件大小不能说明完整，须逐段检查
+                unfinished = [seg for seg in state.get("segments") or [] if seg["pos"] <= seg["end"]]
+                if unfinished:
+                    raise IOError(f"还有 {len(unfinished)} 个分段未下载完成")
+                size = os.path.getsize(part_path)
+                if state.get("total") is not None and size != state["total"]:
+                    raise IOError(f"文件不完整，预期 {state['total']} 字节，实际 {size} 字节")
+                break
+            except (httpx.HTTPError, OSError) as e:
+                if attempt == DOWNLOAD_RESUME_ATTEMPTS:
+                    logger.error(f"下载失败，已保留进度供下次续传: {url} 错误: {str(e)}")
+                    return None
+                logger.warning(f"下载中断，{2 ** attempt} 秒后第 {attempt} 次续传: {url} 错误: {str(e)}")
+                await asyncio.sleep(2 ** attempt)
+        
+        try:
+            sha256 = await asyncio.to_thread(_sha256_file, part_path)
+            # 相同内容只在存储中保存一份，目标位置是指向它的链接
+            blob_path = self.blob_store.put(part_path, sha256)
+        except OSError as e:
+            logger.error(f"保存文件失败: {url} 错误: {str(e)}")
+            return None
+        self._discard_partial(part_path, state_path)
+        return blob_path, size, sha256
+    
+    @staticmethod
+    def _partial_key(url: str) -> str:
+        """规范化 URL 的哈希，用于命名断点续传文件与合并同一 URL 的并发下载"""
+        return hashlib.sha1(DownloadManifest.normalize_url(url).encode('utf-8')).hexdigest()
+    
+    def _partial_paths(self, url: str) -> tuple:
+        """断点续传的数据文件与进度文件路径，以规范化 URL 的哈希命名"""
+        key = self._partial_key(url)
+        return os.path.join(self.partial_dir, f"{key}.part"), os.path.join(self.partial_dir, f"{key}.json")
+    
+    @staticmethod
+    def _load_partial_state(url: str, part_path: str, state_path: str) -> Dict:
+        """读取上次中断时保存的进度，数据文件缺失或进度不匹配时从头下载"""
+        if not (os.path.exists(state_path) and os.path.exists(part_path)):
+            return {}
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if state.get("url") != url:
+            return {}
+        logger.info(f"发现未完成的下载，将从断点续传: {url}")
+        return state
+    
+    @staticmethod
+    def _discard_partial(part_path: str, state_path: str):
+        """删除断点续传的数据文件与进度文件"""
+        for path in (part_path, state_path):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    @staticmethod
+    def _range_headers(state: Dict, start: int, end: Optional[int] = None) -> Dict[str, str]:
+        """构造 Range 请求头；带上 If-Range，服务器端文件已变化时会返回完整内容而不是错位的片段"""
+        headers = {"Range": f"bytes={start}-{'' if end is None else end}"}
+        validator = state.get("etag") or state.get("last_modified")
+        if validator:
+            headers["If-Range"] = validator
+        return headers
+    
+    async def _fetch_stream(self, url: str, part_path: str, state_path: str, state: Dict) -> bool:
+        """
+        单连接下载（有进度时从断点续传），按块写入数据文件。
+        遇到大文件且服务器支持 Range 时只记录分段计划并返回，由 _fetch_segments 并行下载。
+        返回 False 表示本次不再重试的失败（如 403）；资源已被删除时抛出 DownloadGoneError，可重试的错误以其他异常抛出。
+        """
+        offset = os.path.getsize(part_path) if state and os.path.exists(part_path) else 0
+        headers = self._range_headers(state, offset) if offset else {}
+        
+        proxy_url = self.proxy_manager.choose()
+        client = self._get_client(proxy_url)
+        await self.rate_limiter.acquire(url)
+        try:
+            async with self._host_slot(url) as window:
+                started = asyncio.get_running_loop().time()
+                async with client.stream("GET", url, headers=headers) as resp:
+                    window.observe_latency(asyncio.get_running_loop().time() - started)
+                    if self._is_proxy_fault(resp.status_code):
+                        raise httpx.HTTPStatusError(f"状态码 {resp.status_code}", request=resp.request, response=resp)
+                    if resp.status_code not in (200, 206):
+                        # 资源本身的问题（如 404），代理已正常完成请求
+                        self.proxy_manager.report(proxy_url, ok=True)
+                        if resp.status_code in PERMANENT_STATUS_CODES:
+                            raise DownloadGoneError(f"资源已不存在: {url} 状态码: {resp.status_code}")
+                        logger.warning(f"下载失败: {url} 状态码: {resp.status_code}")
+                        return False
                     if resp.status_code == 200:
-                        with open(img_path, 'wb') as f:
-                            f.write(resp.content)
-                        logger.info(f"图片已保存: {img_path}")
-                        success = True
+                        # 服务器忽略了 Range 或文件已变化，从头下载
+                        offset = 0
                     else:
-                        logger.warning(f"下载图片失败: {url} 状态码: {resp.status_code}")
-                        self.failed_downloads.append((dynamic_id, user_name, url))
-                except Exception as e:
-                    logger.error(f"下载图片异常: {url} 错误: {str(e)}")
-                    self.failed_downloads.append((dynamic_id, user_name, url))
-            
-            return success
-        except Exception as e:
-            logger.error(f"保存图片失败: {str(e)}")
-            return False
+                        content_range = self._content_range(resp)
+                        if (
+                            content_range is None or content_range[0] != offset
+                            or (state.get("total") is not None and content_range[1] != state["total"])
+                        ):
+                            # 片段不是从请求的位置开始，或文件总大小与记录不符，接在本地进度后会拼出损坏的文件
+                            self._reset_partial(part_path, state)
+                            raise IOError(
+                                f"续传响应的 Content-Range 与请求不符: 请求 {offset}-，"
+                                f"收到 {resp.headers.get('Content-Range')!r}，从头重新下载"
+                            )
+                    
+                    state.update({
+                        "url": url,
+                        "etag": resp.headers.get("ETag"),
+                        "last_modified": resp.headers.get("Last-Modified"),
+                        "total": self._response_total(resp, offset)
+                    })
+                    total = state["total"]
+                    if (
+                        offset == 0 and total and total >= RANGE_SPLIT_THRESHOLD
+                        and resp.headers.get("Accept-Ranges") == "bytes"
+                    ):
+                        self._plan_segments(part_path, state, total)
+                        _atomic_write_json(state_path, state)
+                        return True
+                    _atomic_write_json(state_path, state)
+                    
+                    with open(part_path, 'r+b' if offset else 'wb') as f:
+                        f.seek(offset)
+                        f.truncate()
+                        async for chunk in resp.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                            f.write(chunk)
+                        f.flush()
+                        await asyncio.to_thread(os.fsync, f.fileno())
+            self.proxy_manager.report(proxy_url, ok=True, latency=resp.elapsed.total_seconds())
+            return True
+        except httpx.HTTPError:
+            # 只有传输错误与 _is_proxy_fault 的状态码记为代理失败，本地写文件出错与代理无关
+            self.proxy_manager.report(proxy_url, ok=False)
+            raise
+    
+    @staticmethod
+    def _is_proxy_fault(status_code: int) -> bool:
+        """407（代理认证失败）、429（出口 IP 被限流）与 5xx 计入代理的失败率，其余完成的响应说明代理工作正常"""
+        return status_code in (407, 429) or status_code >= 500
+    
+    @staticmethod
+    def _content_range(resp: httpx.Response) -> Optional[tuple]:
+        """解析 206 响应的 Content-Range（bytes <起始>-<结束>/<总大小>），返回 (起始位置, 总大小或 None)，格式无效时返回 None"""
+        unit, _, spec = resp.headers.get("Content-Range", "").strip().partition(" ")
+        byte_range, _, total = spec.partition("/")
+        start = byte_range.split("-", 1)[0]
+        if unit != "bytes" or not start.isdigit():
+            return None
+        return int(start), int(total) if total.isdigit() else None
+    
+    @staticmethod
+    def _reset_partial(part_path: str, state: Dict):
+        """丢弃单连接下载的进度：清空数据文件与状态，下一次尝试从 0 开始"""
+        with open(part_path, 'wb'):
+            pass
+        state.clear()
+    
+    @staticmethod
+    def _response_total(resp: httpx.Response, offset: int) -> Optional[int]:
+        """根据 Content-Range / Content-Length 计算文件总大小，内容经过压缩编码时无法得知"""
+        content_range = ContentDownloader._content_range(resp) if resp.status_code == 206 else None
+        if content_range and content_range[1] is not None:
+            return content_range[1]
+        length = resp.headers.get("Content-Length")
+        if length and length.isdigit() and resp.headers.get("Content-Encoding") is None:
+            return offset + int(length)
+        return None
+    
+    @staticmethod
+    def _plan_segments(part_path: str, state: Dict, total: int):
+        """预分配数据文件并把文件均分为 RANGE_SEGMENTS 段，每段记录下一个待写入的位置"""
+        with open(part_path, 'wb') as f:
+            f.truncate(total)
+        step = -(-total // RANGE_SEGMENTS)
+        state["segments"] = [
+            {"start": start, "end": min(start + step, total) - 1, "pos": start}
+            for start in range(0, total, step)
+        ]
+        logger.info(f"大文件分 {len(state['segments'])} 段并行下载: {state['url']} ({total} 字节)")
+    
+    async def _fetch_segments(self, url: str, part_path: str, state_path: str, state: Dict):
+        """并行下载未完成的分段，全部结束后再抛出其中的第一个错误，已完成的进度都会保存"""
+        pending = [seg for seg in state["segments"] if seg["pos"] <= seg["end"]]
+        results = await asyncio.gather(
+            *(self._fetch_segment(url, part_path, state_path, state, seg) for seg in pending),
+            return_exceptions=True
+        )
+        _atomic_write_json(state_path, state)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+    
+    async def _fetch_segment(self, url: str, part_path: str, state_path: str, state: Dict, seg: Dict):
+        """下载单个分段并写入数据文件的对应位置，每写入约 1MB 落盘一次并保存进度"""
+        proxy_url = self.proxy_manager.choose()
+        client = self._get_client(proxy_url)
+        await self.rate_limiter.acquire(url)
+        try:
+            async with self._host_slot(url) as window:
+                started = asyncio.get_running_loop().time()
+                async with client.stream("GET", url, headers=self._range_headers(state, seg["pos"], seg["end"])) as resp:
+                    window.observe_latency(asyncio.get_running_loop().time() - started)
+                    if self._is_proxy_fault(resp.status_code):
+                        raise httpx.HTTPStatusError(f"状态码 {resp.status_code}", request=resp.request, response=resp)
+                    content_range = self._content_range(resp) if resp.status_code == 206 else None
+                    if content_range is None or content_range[1] != state.get("total"):
+                        # 服务器不再支持 Range 或文件已变化，放弃分段计划，下次从头单连接下载
+                        self.proxy_manager.report(proxy_url, ok=True)
+                        state.pop("segments", None)
+                        os.remove(part_path)
+                        raise IOError(
+                            f"分段请求未返回预期的 206，状态码: {resp.status_code}，"
+                            f"Content-Range: {resp.headers.get('Content-Range')!r}"
+                        )
+                    if content_range[0] != seg["pos"]:
+                        # 片段起点与请求不符，不写入，下次仍从 pos 续传
+                        raise IOError(f"分段响应起点 {content_range[0]} 与请求的 {seg['pos']} 不符")
+                    with open(part_path, 'r+b') as f:
+                        f.seek(seg["pos"])
+                        unsynced = 0
+                        async for chunk in resp.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                            # seg["pos"] 只在落盘时推进，当前写入位置是 pos + unsynced
+                            chunk = chunk[:seg["end"] + 1 - (seg["pos"] + unsynced)]
+                            f.write(chunk)
+                            unsynced += len(chunk)
+                            if unsynced >= 1024 * 1024:
+                                f.flush()
+                                await asyncio.to_thread(os.fsync, f.fileno())
+                                seg["pos"] += unsynced
+                                unsynced = 0
+                                _atomic_write_json(state_path, state)
+                            if seg["pos"] + unsynced > seg["end"]:
+                                break
+                        f.flush()
+                        await asyncio.to_thread(os.fsync, f.fileno())
+                        seg["pos"] += unsynced
+                    if seg["pos"] <= seg["end"]:
+                        # 206 响应体提前结束（传输被截断），已写入的部分保留在进度中，下次从 pos 续传
+                        self.proxy_manager.report(proxy_url, ok=False)
+                        raise IOError(f"分段提前结束: {seg['start']}-{seg['end']} 停在 {seg['pos']}")
+            self.proxy_manager.report(proxy_url, ok=True, latency=resp.elapsed.total_seconds())
+        except httpx.HTTPError:
+            self.proxy_manager.report(proxy_url, ok=False)
+            raise
 
 class OutputManager:
-    """输出管理类"""
+    """输出管理类：处理结果逐条追加写入 JSONL 文件，内存中只保留统计计数"""
     
-    def __init__(self, csv_file: Optional[str] = None, user_manager: Optional[UserManager] = None):
+    def __init__(
+        self,
+        csv_file: Optional[str] = None,
+        user_manager: Optional[UserManager] = None,
+        results_file: Optional[str] = None,
+        overwrite: bool = False
+    ):
+        """:param overwrite: 清空已有的结果文件而不是追加（离线重处理每次都生成完整的结果，追加会产生重复）"""
         self.csv_file = csv_file
         self.user_manager = user_manager  # 添加 UserManager 引用
-        self.results = []
+        self.results_file = results_file
+        self._results_fp = None
+        if overwrite and results_file:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(results_file)
+        self.total = 0
+        self.success = 0
+        self.types_count: Dict[str, int] = {}
         self.updated_users = {}
+        # 写回 CSV 会等待文件锁并重写整个文件，运行中通过 asyncio.to_thread 在线程中执行，注册表的使用由 _registry_lock 串行化
+        self.registry = (
+            ArtistRegistry(csv_file, check_same_thread=False) if csv_file and os.path.exists(csv_file) else None
+        )
+        self._registry_lock = threading.Lock()
+        self._last_export: Optional[float] = None
     
     def add_result(self, result: Dict):
-        """添加处理结果"""
-        self.results.append(result)
+        """添加处理结果：立即追加到结果文件，中途崩溃时已处理的结果不会丢失"""
+        self.total += 1
+        if result["download_success"]:
+            self.success += 1
+        self.types_count[result["type_name"]] = self.types_count.get(result["type_name"], 0) + 1
+        self._write_result(result)
         
         # 记录需要更新轮询时间的用户
         # 只更新从 CSV 加载的用户
         user_id = result["user_id"]
         if self.user_manager:
-            user_info = next((u for u in self.user_manager.users if u["id"] == user_id), None)
+            user_info = self.user_manager.get_user(user_id)
             if user_info and user_info.get("source") == "csv":
                 now = datetime.now()
                 today_zero = datetime(now.year, now.month, now.day)
                 self.updated_users[user_id] = today_zero.strftime("%Y:%m:%d")
     
-    def save_to_json(self, file_path: str):
-        """保存结果到JSON文件"""
+    def _write_result(self, result: Dict):
+        """以 JSON Lines 格式追加一条结果"""
+        if not self.results_file:
+            return
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(self.results, f, ensure_ascii=False, indent=2)
-            logger.info(f"结果已保存到: {file_path}")
-        except Exception as e:
-            logger.error(f"保存JSON失败: {str(e)}")
+            if self._results_fp is None:
+                os.makedirs(os.path.dirname(self.results_file) or '.', exist_ok=True)
+                self._results_fp = open(self.results_file, 'a', encoding='utf-8')
+            self._results_fp.write(json.dumps(result, ensure_ascii=False) + "\n")
+            self._results_fp.flush()
+        except OSError as e:
+            logger.error(f"写入结果失败: {str(e)}")
+    
+    def close(self):
+        """关闭结果文件与画师注册表"""
+        if self._results_fp is not None:
+            self._results_fp.close()
+            self._results_fp = None
+            logger.info(f"结果已保存到: {self.results_file}")
+        with self._registry_lock:
+            if self.registry is not None:
+                self.registry.close()
+                self.registry = None
     
-    def update_csv(self):
-        """更新CSV文件中的轮询时间"""
-        if not self.csv_file or not os.path.exists(self.csv_file):
+    def update_csv(self, user_ids: Optional[List[int]] = None):
+        """
+        更新轮询时间：先在画师注册表中单点更新对应用户，再由注册表在文件锁内原子写回 CSV（不会覆盖其他脚本的改动）
+        :param user_ids: 只更新这些用户（用户处理完成时调用），距上次写回不足 CSV_EXPORT_INTERVAL 秒时只写注册表；
+                         None 表示全部用户并立即写回 CSV（运行结束或中途退出时调用）
+        可能阻塞较长时间（等待其他脚本释放文件锁），运行中应通过 asyncio.to_thread 调用
+        """
+        with self._registry_lock:
+            self._update_csv(user_ids)
+    
+    def _update_csv(self, user_ids: Optional[List[int]]):
+        if not self.registry:
             logger.warning(f"CSV文件不存在: {self.csv_file}")
             return
         
         try:
-            df = pd.read_csv(self.csv_file, dtype=str).fillna('')
             updated_count = 0
-            
-            for idx, row in df.iterrows():
-                user_id = row.get('bilibili_id')
-                if user_id and user_id.isdigit() and int(user_id) in self.updated_users:
-                    df.at[idx, 'bilibili_roll_time'] = self.updated_users[int(user_id)]
-                    updated_count += 1
-            
-            df = df.astype(str)
-            df.to_csv(self.csv_file, index=False, encoding='utf-8')
-            logger.info(f"已更新 {updated_count} 个用户的轮询时间")
+            for user_id in (list(self.updated_users) if user_ids is None else user_ids):
+                if user_id in self.updated_users:
+                    updated_count += self.registry.set_roll_time('bilibili', str(user_id), self.updated_users[user_id])
+            if updated_count:
+                logger.info(f"已更新 {updated_count} 个用户的轮询时间")
+            now = datetime.now().timestamp()
+            if user_ids is None or self._last_export is None or now - self._last_export >= CSV_EXPORT_INTERVAL:
+                self._last_export = now
+                if self.registry.export_csv():
+                    logger.info(f"轮询时间已写回: {self.csv_file}")
         except Exception as e:
             logger.error(f"更新CSV失败: {str(e)}")
     
     def print_summary(self):
         """打印处理摘要"""
-        success = 0
-        failed = 0
-        types_count = {}
-        
-        for result in self.results:
-            if result["download_success"]:
-                success += 1
-            else:
-                failed += 1
-            
-            dyn_type = result["type_name"]
-            types_count[dyn_type] = types_count.get(dyn_type, 0) + 1
+        failed = self.total - self.success
         
         print("\n" + "="*50)
-        print(f"处理完成! 总计: {len(self.results)} 条动态")
-        print(f"成功下载: {success} 条, 失败: {failed} 条")
+        print(f"处理完成! 总计: {self.total} 条动态")
+        print(f"成功下载: {self.success} 条, 失败: {failed} 条")
         print("\n动态类型分布:")
-        for dyn_type, count in types_count.items():
+        for dyn_type, count in self.types_count.items():
             print(f"  {dyn_type}: {count} 条")
         
         if failed > 0:
@@ -544,80 +1920,273 @@ class OutputManager:
 class BiliDynamicHarvester:
     """B站动态采集主控制器"""
     
-    def __init__(self):
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = load_config() if config is None else config
+        self.rate_limiter = RateLimiter(self.config.get("rate_limits"))
+        self.proxy_manager = ProxyManager(self.config.get("proxy_pool"))
         self.user_manager = UserManager()
-        self.downloader = ContentDownloader()
+        self.downloader = ContentDownloader(
+            rate_limiter=self.rate_limiter,
+            proxy_manager=self.proxy_manager,
+            host_limits=self.config.get("download_host_limits")
+        )
+        self.cursor_store = CursorStore()
+        self.circuit_breaker = CircuitBreaker()
+        self.retry_queue = RetryQueue()
+        self.raw_archive = RawArchive()
         self.output_manager = None
     
-    async def process_user(self, user_info: Dict, credential: Credential, full_fetch: bool = False):
-        """处理单个用户的所有动态"""
-        fetcher = DynamicFetcher(credential)
-        dynamics = await fetcher.fetch_user_dynamics(user_info, full_fetch)
+    async def process_user(
+        self,
+        user_info: Dict,
+        credential_pool: CredentialPool,
+        full_fetch: bool = False,
+        retry_entry: Optional[Dict] = None
+    ):
+        """处理单个用户的所有动态，传入 retry_entry 时从重试条目记录的位置续传"""
+        slot = await credential_pool.acquire()
+        try:
+            await self._process_user_with(user_info, slot, full_fetch, retry_entry)
+        finally:
+            credential_pool.release(slot)
+    
+    async def _process_user_with(
+        self,
+        user_info: Dict,
+        slot: CredentialSlot,
+        full_fetch: bool,
+        retry_entry: Optional[Dict]
+    ):
+        """使用分配到的账号处理单个用户"""
+        fetcher = DynamicFetcher(
+            slot.credential, self.cursor_store, self.rate_limiter, self.circuit_breaker, self.retry_queue, slot,
+            self.proxy_manager
+        )
         
-        for dynamic in dynamics:
-            processor = ProcessorFactory.create_processor(dynamic)
-            
-            # 提取内容
-            content = processor.extract_content()
-            
-            # 下载资源
-            download_success = await processor.download_resources(self.downloader)
-            
-            # 记录结果
-            result = {
-                "user_id": user_info["id"],
-                "user_name": user_info["name"],
-                "dynamic_id": dynamic["id"],
-                "type": dynamic["type"],
-                "type_name": dynamic["type_name"],
-                "timestamp": dynamic["timestamp"],
-                "content": content,
-                "download_success": download_success
-            }
-            
-            self.output_manager.add_result(result)
-            
-            # 日志记录
-            logger.info(f"处理动态: 用户={user_info['name']}, ID={dynamic['id']}, "
-                       f"类型={dynamic['type_name']}, 下载={'成功' if download_success else '失败'}")
+        # 获取与处理通过有界队列衔接：后续页面仍在获取时即可开始处理与下载，内存占用与动态总数无关
+        dynamic_queue: asyncio.Queue = asyncio.Queue(maxsize=DYNAMIC_QUEUE_SIZE)
+        
+        async def produce():
+            try:
+                async for dynamic_data in fetcher.iter_user_dynamics(user_info, full_fetch, retry_entry):
+                    await dynamic_queue.put(dynamic_data)
+            except Exception as e:
+                logger.error(f"获取用户 {user_info['name']} 动态中断: {str(e)}")
+            await dynamic_queue.put(None)
+        
+        producer = asyncio.create_task(produce())
+        newest = None
+        try:
+            while (dynamic := await dynamic_queue.get()) is not None:
+                self.raw_archive.add(dynamic)
+                await self._process_dynamic(user_info, dynamic)
+                if newest is None or not CursorStore.is_seen(
+                    {"id_str": newest["id"], "pub_ts": newest["timestamp"]}, dynamic["id"], dynamic["timestamp"]
+                ):
+                    newest = dynamic
+            await producer
+        finally:
+            producer.cancel()
+        
+        # 处理完成后再推进游标，避免中途崩溃时跳过未处理的动态
+        if newest:
+            self.cursor_store.update(user_info["id"], newest["id"], newest["timestamp"])
+            self.cursor_store.save()
+        
+        # 每个用户处理完成后立即在注册表中更新其轮询时间，并按 CSV_EXPORT_INTERVAL 节流写回 CSV；
+        # 写回可能等待文件锁并重写整个文件，放到线程中执行，不阻塞其他用户的抓取与下载
+        if self.output_manager and self.output_manager.registry:
+            await asyncio.to_thread(self.output_manager.update_csv, [user_info["id"]])
+    
+    async def _process_dynamic(self, user_info: Dict, dynamic: Dict, download: bool = True):
+        """处理单条动态：提取内容、下载资源并记录结果"""
+        processor = ProcessorFactory.create_processor(dynamic)
+        
+        # 提取内容
+        content = processor.extract_content()
+        
+        # 下载资源
+        download_success = await processor.download_resources(self.downloader) if download else False
+        
+        # 记录结果
+        result = {
+            "user_id": user_info["id"],
+            "user_name": user_info["name"],
+            "dynamic_id": dynamic["id"],
+            "type": dynamic["type"],
+            "type_name": dynamic["type_name"],
+            "timestamp": dynamic["timestamp"],
+            "content": content,
+            "download_success": download_success
+        }
+        
+        self.output_manager.add_result(result)
+        
+        # 日志记录
+        logger.info(f"处理动态: 用户={user_info['name']}, ID={dynamic['id']}, "
+                   f"类型={dynamic['type_name']}, 下载={'成功' if download_success else '失败'}")
     
     async def run(
         self, 
-        credential: Credential,
+        credential: Union[Credential, CredentialPool],
         csv_file: Optional[str] = None,
         full_fetch: bool = False,
-        group_size: int = 5
+        concurrency: int = 3
     ):
-        """运行采集器"""
+        """
+        运行采集器
+        :param credential: 单个凭证或凭证池，使用凭证池时用户会分摊到多个账号上
+        :param concurrency: 同时处理的用户数上限，任一用户处理完成后立即开始下一个用户
+        """
+        credential_pool = credential if isinstance(credential, CredentialPool) else CredentialPool(
+            {"default": credential}, self.config.get("credential_rate_limit")
+        )
         # 初始化输出管理器
-        self.output_manager = OutputManager(csv_file, self.user_manager)
+        self.output_manager = OutputManager(
+            csv_file, self.user_manager, os.path.join(self.downloader.base_dir, "results.jsonl")
+        )
+        try:
+            await self._run_users(credential_pool, full_fetch, concurrency)
+        finally:
+            # 无论正常结束、出错还是被中断（Ctrl-C），都把已更新的轮询时间写回 CSV，并关闭各数据库
+            if csv_file:
+                self.output_manager.update_csv()
+            self.output_manager.close()
+            await self.downloader.aclose()
+            self.close()
+        
+        if self.user_manager.users:
+            self.output_manager.print_summary()
         
+        # 打印下载失败详情
+        if self.downloader.failed_downloads:
+            print("\n下载失败详情:")
+            for fail in self.downloader.failed_downloads:
+                print(f"动态ID: {fail[0]}, 用户: {fail[1]}, URL: {fail[2]}")
+            print(f"以上资源已写入下载重试队列（共 {len(self.downloader.retry_queue)} 个待重试），将在下次运行时自动重试")
+    
+    async def _run_users(self, credential_pool: CredentialPool, full_fetch: bool, concurrency: int):
+        """续传遗留条目并处理全部用户"""
         if not self.user_manager.users:
             logger.warning("没有可处理的用户")
             return
         
-        # 分组处理用户
-        user_groups = self.user_manager.get_users(group_size)
+        self.proxy_manager.rotate_api_proxy()
         
-        for group in user_groups:
-            tasks = [self.process_user(user, credential, full_fetch) for user in group]
-            await asyncio.gather(*tasks)
-            
-            # 组间延迟
-            await asyncio.sleep(random.uniform(5, 10))
+        # 先续传上次运行遗留的失败条目，并重试到期的下载失败资源
+        await self.downloader.retry_failed_downloads()
+        await self.drain_retry_queue(credential_pool, concurrency)
         
-        # 后处理
-        if csv_file:
-            self.output_manager.update_csv()
+        logger.info(f"共 {len(self.user_manager.users)} 个用户，并发数 {concurrency}")
+        await self._run_pool(
+            self.user_manager.users,
+            lambda user_info: self.process_user(user_info, credential_pool, full_fetch),
+            concurrency
+        )
         
-        self.output_manager.save_to_json("C:/Users/Ryimi/Downloads/bilibili/results.json")
-        self.output_manager.print_summary()
+        # 本次运行中失败的条目在熔断冷却后再续传一次，仍失败的留到下次运行
+        await self.drain_retry_queue(credential_pool, concurrency)
         
-        # 打印下载失败详情
-        if self.downloader.failed_downloads:
-            print("\n下载失败详情:")
-            for fail in self.downloader.failed_downloads:
-                print(f"动态ID: {fail[0]}, 用户: {fail[1]}, URL: {fail[2]}")
+        await self.downloader.aclose()
+        logger.info(f"各主机请求数: {self.rate_limiter.request_counts}，清单命中跳过 {self.downloader.skipped_count} 张图片，"
+                    f"内容重复未写入 {self.downloader.blob_store.dedup_count} 张")
+        logger.info(f"各账号分配用户数: { {slot.name: slot.assigned for slot in credential_pool.slots} }")
+        if self.proxy_manager.stats:
+            logger.info(f"各代理统计: {self.proxy_manager.summary()}")
+        if self.downloader.host_windows:
+            logger.info(f"各主机下载并发窗口: { {key: w.summary() for key, w in self.downloader.host_windows.items()} }")
+    
+    async def retry_downloads(self):
+        """只重试下载重试队列中的全部资源，不轮询任何用户，也不需要凭证"""
+        try:
+            retried = await self.downloader.retry_failed_downloads(ignore_backoff=True)
+        finally:
+            await self.downloader.aclose()
+            self.close()
+        print(f"下载重试完成: 成功 {retried} 个，仍有 {len(self.downloader.retry_queue)} 个待重试")
+    
+    async def _run_pool(self, user_infos: List[Dict], handler, concurrency: int):
+        """滑动窗口处理用户：固定数量的工作协程从队列中取用户，慢用户不会阻塞其他用户"""
+        user_queue: asyncio.Queue = asyncio.Queue()
+        for user_info in user_infos:
+            user_queue.put_nowait(user_info)
+        
+        async def worker():
+            while True:
+                try:
+                    user_info = user_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await handler(user_info)
+                except Exception as e:
+                    logger.error(f"处理用户 {user_info['name']}({user_info['id']}) 失败: {str(e)}")
+        
+        worker_count = max(1, min(concurrency, len(user_infos)))
+        await asyncio.gather(*(worker() for _ in range(worker_count)))
+    
+    async def drain_retry_queue(self, credential_pool: CredentialPool, concurrency: int = 3):
+        """续传重试队列中的 (用户, offset) 条目，再次失败的条目会带着递增的重试次数重新入队"""
+        entries = self.retry_queue.snapshot()
+        if not entries:
+            return
+        logger.info(f"开始续传 {len(entries)} 个失败条目")
+        
+        async def retry(item: Dict):
+            entry = item["retry_entry"]
+            user_info = self.user_manager.get_user(entry["user_id"]) or {
+                "id": entry["user_id"], "name": entry["user_name"], "source": "retry"
+            }
+            await self.process_user(user_info, credential_pool, entry["full_fetch"], retry_entry=entry)
+            self.retry_queue.discard(entry)
+        
+        await self._run_pool(
+            [{"id": entry["user_id"], "name": entry["user_name"], "retry_entry": entry} for entry in entries],
+            retry,
+            concurrency
+        )
+        logger.info(f"续传结束，仍有 {len(self.retry_queue)} 个条目待重试")
+    
+    async def replay(self, user_ids: Optional[List[int]] = None, download: bool = False):
+        """
+        离线重处理：将归档中的原始动态重新交给 ProcessorFactory 处理，不请求 B 站 API
+        :param user_ids: 只重处理这些用户，None 表示全部
+        :param download: 是否同时下载资源（会访问图片 CDN），默认只提取内容
+        """
+        # 每次重处理都从头生成完整结果，覆盖上次的结果文件
+        self.output_manager = OutputManager(
+            None, self.user_manager, os.path.join(self.downloader.base_dir, "replay_results.jsonl"), overwrite=True
+        )
+        
+        count = 0
+        try:
+            for dynamic in self.raw_archive.iter_dynamics(user_ids):
+                user_info = {"id": dynamic["user_id"], "name": dynamic["user_name"]}
+                await self._process_dynamic(user_info, dynamic, download=download)
+                count += 1
+        finally:
+            await self.downloader.aclose()
+            self.output_manager.close()
+            self.close()
+        logger.info(f"离线重处理完成，共 {count} 条动态")
+        self.output_manager.print_summary()
+    
+    def close(self):
+        """关闭原始动态归档与下载清单的数据库连接，run / replay / retry_downloads 结束时调用"""
+        self.raw_archive.close()
+        self.downloader.manifest.close()
+
+def load_config(config_path: str = "data/config.json") -> Dict:
+    """加载 data/config.json，文件不存在时使用默认配置"""
+    if not os.path.exists(config_path):
+        logger.warning(f"配置文件不存在，使用默认配置: {config_path}")
+        return {}
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error(f"加载配置文件失败，使用默认配置: {str(e)}")
+        return {}
 
 def load_bilibili_credential(cookies_path: str = "userdata/bilibili-cookies.json") -> Credential:
     """加载B站凭证"""
@@ -645,9 +2214,9 @@ async def main():
     # 初始化采集器
     harvester = BiliDynamicHarvester()
     
-    # 加载凭证
+    # 加载凭证池（userdata/bilibili-cookies*.json，每个文件一个账号）
     try:
-        credential = load_bilibili_credential()
+        credential_pool = CredentialPool.from_cookie_files(config=harvester.config)
     except Exception as e:
         logger.error(f"凭证加载失败: {str(e)}")
         return
@@ -662,43 +2231,65 @@ async def main():
 
     # 运行采集
     await harvester.run(
-        credential=credential,
+        credential=credential_pool,
         csv_file=csv_path,  # CSV文件路径
         # csv_file=None,  # CSV文件路径
         full_fetch=False,           # True=全量抓取, False=增量抓取
-        group_size=3                 # 每组用户数量
+        concurrency=3                # 同时处理的用户数量
+    )
+
+
+async def replay_main():
+    """离线重处理主函数：基于本地归档重新提取内容，无需凭证"""
+    harvester = BiliDynamicHarvester()
+    await harvester.replay(
+        user_ids=None,      # None=全部用户，或传入 bilibili_id 列表
+        download=False      # True=同时下载资源
     )
 
 
-async def fetch_single_dynamic(credential: Credential, user_id: int, dynamic_id: str):
+async def retry_downloads_main():
+    """仅重试下载失败的资源"""
+    harvester = BiliDynamicHarvester()
+    await harvester.retry_downloads()
+
+
+async def fetch_single_dynamic(credential: Credential, dynamic_id: str, raw_archive: Optional[RawArchive] = None):
     """
-    获取指定动态的原始数据
+    获取指定动态的原始数据：先查本地归档（零请求），未命中时通过动态详情接口按 ID 直接获取（一次请求）
     :param credential: B站凭证
-    :param user_id: 用户ID
     :param dynamic_id: 动态ID
+    :param raw_archive: 原始动态归档，传入时先查归档并把新获取的动态写入归档
     :return: 动态的原始数据
     """
-    u = user.User(user_id, credential=credential)
-    offset = ""
-    has_more = True
+    if raw_archive:
+        archived = raw_archive.get(dynamic_id)
+        if archived:
+            logger.info(f"动态 {dynamic_id} 命中本地归档")
+            return archived["raw_data"]
+    
     try:
-        while has_more:
-            # 获取用户的动态数据
-            dynamics = await u.get_dynamics_new(offset)
-            if not dynamics or "items" not in dynamics or not dynamics["items"]:
-                break
-            items = dynamics["items"]
-            for item in items:
-                item_dynamic_id = item.get("id_str", str(item.get("id", "")))
-                if item_dynamic_id == dynamic_id:
-                    return item
-            # 检查是否还有更多
-            has_more = dynamics.get("has_more", 0) == 1
-            if has_more:
-                offset = dynamics.get("offset", "")
+        info = await dynamic.Dynamic(int(dynamic_id), credential=credential).get_info()
     except Exception as e:
         logger.error(f"获取动态 {dynamic_id} 失败: {str(e)}")
-    return None
+        return None
+    
+    item = (info or {}).get("item")
+    if not item:
+        return None
+    
+    if raw_archive:
+        modules = item.get("modules", {})
+        author = modules.get("module_author", {})
+        raw_archive.add({
+            "user_id": author.get("mid", 0),
+            "user_name": author.get("name", ""),
+            "id": item.get("id_str", dynamic_id),
+            "type": item.get("type", "UNKNOWN"),
+            "timestamp": author.get("pub_ts", 0),
+            "raw_data": item
+        })
+    return item
 
 async def testoneopus():
     """主函数"""
@@ -711,20 +2302,24 @@ async def testoneopus():
         return
 
     # 获取指定动态的原始数据
-    user_id = 23306371  # 替换为实际的用户ID
     dynamic_id = "992701134074281988"  # 替换为实际的动态ID
-    single_dynamic = await fetch_single_dynamic(credential, user_id, dynamic_id)
+    raw_archive = RawArchive()
+    try:
+        single_dynamic = await fetch_single_dynamic(credential, dynamic_id, raw_archive)
+    finally:
+        raw_archive.close()
     if single_dynamic:
         print(f"动态 {dynamic_id} 的原始数据:")
         print(json.dumps(single_dynamic, ensure_ascii=False, indent=2))
-        # 构建动态数据字典
+        # 构建动态数据字典，作者信息取自动态本身
+        author = single_dynamic.get("modules", {}).get("module_author", {})
         dynamic_data = {
-            "user_id": user_id,
-            "user_name": "手动用户",  # 这里可以根据实际情况修改
+            "user_id": author.get("mid", 0),
+            "user_name": author.get("name", ""),
             "id": dynamic_id,
             "type": single_dynamic.get("type", "UNKNOWN"),
             "type_name": DYNAMIC_TYPE_MAP.get(single_dynamic.get("type", ""), "未知类型"),
-            "timestamp": single_dynamic["modules"]["module_author"]["pub_ts"],
+            "timestamp": author.get("pub_ts", 0),
             "raw_data": single_dynamic
         }
 
@@ -736,7 +2331,10 @@ async def testoneopus():
         content = processor.extract_content()
 
         # 下载资源
-        download_success = await processor.download_resources(downloader)
+        try:
+            download_success = await processor.download_resources(downloader)
+        finally:
+            await downloader.aclose()
 
         if download_success:
             print(f"动态 {dynamic_id} 的图片下载成功")
@@ -747,5 +2345,8 @@ async def testoneopus():
 
 
 if __name__ == "__main__":
+    setup_logging()
     # asyncio.run(testoneopus())
+    # asyncio.run(replay_main())
+    # asyncio.run(retry_downloads_main())
     asyncio.run(main())
@@ -1,10 +1,15 @@
 import time
-import pandas as pd
 import json
+import os
+import sys
 from datetime import datetime
 from pywinauto.application import Application, timings
 from pywinauto.findwindows import ElementNotFoundError
 
+# Artist.csv 读写工具与 data/tools 下的脚本共用（标准库 csv 实现，不依赖 pandas，启动更快）
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'tools'))
+import artist_csv
+
 # 设置全局超时时间，防止因窗口未及时响应而报错
 timings.Timings.window_find_timeout = 15
 
@@ -50,29 +55,24 @@ def read_twitter_csv(file_path: str, encoding: str = 'utf-8') -> tuple[list[dict
     """
     try:
         log("INFO", f"正在尝试从 '{file_path}' 读取数据...")
-        # 1. 读取CSV文件（仅加载目标列，提升效率）
-        df = pd.read_csv(
-            file_path,
-            usecols=['twitter_id', 'twitter_roll_time'],
-            encoding=encoding,
-            dtype=str
-        )
+        # 1. 读取CSV文件（CSV 未变化时直接复用解析好的快照），仅保留目标列
+        table = artist_csv.load_table(file_path, encoding=encoding)
+        missing_cols = [col for col in ['twitter_id', 'twitter_roll_time'] if col not in table.fieldnames]
+        if missing_cols:
+            raise KeyError(missing_cols)
+        records = [{'twitter_id': row['twitter_id'], 'twitter_roll_time': row['twitter_roll_time']} for row in table.rows]
         
         # 2. 检查是否存在空值
-        null_count = df.isnull().sum().sum()
+        null_count = sum(not value for record in records for value in record.values())
         if null_count > 0:
             log("WARNING", f"CSV文件中存在 {null_count} 个空值，已自动过滤空行。")
-            df = df.dropna(subset=['twitter_id', 'twitter_roll_time'])
+            records = [record for record in records if record['twitter_id'] and record['twitter_roll_time']]
         
-        # 定义过滤条件：不包含';'的ID为有效ID
-        valid_condition = ~df['twitter_id'].str.contains(';', na=False)
-        # 收集被跳过的含';'的ID（取反条件）
-        skipped_ids = df[~valid_condition]['twitter_id'].tolist()
-        # 应用过滤条件，只保留有效ID
-        filtered_df = df[valid_condition].copy()
+        # 收集被跳过的含';'的ID
+        skipped_ids = [record['twitter_id'] for record in records if ';' in record['twitter_id']]
 
-        # 3. 转换为列表套字典格式
-        twitter_list = filtered_df.to_dict('records')
+        # 3. 只保留不包含';'的有效ID
+        twitter_list = [record for record in records if ';' not in record['twitter_id']]
         
         log("SUCCESS", f"成功读取！共获取 {len(twitter_list)} 条有效Twitter数据。")
         if skipped_ids:
@@ -89,7 +89,7 @@ def read_twitter_csv(file_path: str, encoding: str = 'utf-8') -> tuple[list[dict
         raise FileNotFoundError(f"未找到文件 -> {file_path}")
     except KeyError as e:
         # 更好地处理缺少列的错误信息
-        missing_cols = [col for col in ['twitter_id', 'twitter_roll_time'] if col not in df.columns]
+        missing_cols = e.args[0]
         log("ERROR", f"CSV文件缺少必要列。缺失列：{missing_cols}")
         raise KeyError(f"CSV文件缺少必要列 -> 缺失列：{missing_cols}")
     except Exception as e:
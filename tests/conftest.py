@@ -0,0 +1,23 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# data/tools 下的脚本以同目录 import 的方式互相引用
+sys.path.insert(0, os.path.join(REPO_ROOT, "data", "tools"))
+
+
+@pytest.fixture(scope="session")
+def bili_main():
+    """按路径加载 main/bili_poller/main.py（缺少 bilibili_api / httpx 时跳过）"""
+    pytest.importorskip("httpx")
+    pytest.importorskip("bilibili_api")
+    spec = importlib.util.spec_from_file_location(
+        "bili_poller_main", os.path.join(REPO_ROOT, "main", "bili_poller", "main.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,68 @@
+import asyncio
+import heapq
+import random
+
+
+def simulate(bili_main, latency_for, requests=3000, seed=1, max_window=32):
+    """用虚拟时钟模拟下载：窗口有空位就发起请求，延迟由 latency_for(rng, 在途请求数) 给出"""
+    rng = random.Random(seed)
+    now = [0.0]
+    window = bili_main.AdaptiveWindow("example.com", max_window, clock=lambda: now[0])
+    history = []
+
+    async def run():
+        pending = []
+        started = 0
+        while started < requests or pending:
+            while started < requests and window.in_flight < int(window.window):
+                await window.acquire()
+                latency = latency_for(rng, window.in_flight)
+                heapq.heappush(pending, (now[0] + latency, started, latency))
+                started += 1
+            now[0], _, latency = heapq.heappop(pending)
+            window.observe_latency(latency)
+            await window.release()
+            history.append(int(window.window))
+
+    asyncio.run(run())
+    return window, history
+
+
+def test_steady_latency_grows_to_max(bili_main):
+    window, _ = simulate(bili_main, lambda rng, n: rng.uniform(0.05, 0.06))
+    assert window.window == window.max_window
+    assert window.decreases == 0
+
+
+def test_jittery_latency_does_not_collapse(bili_main):
+    window, history = simulate(bili_main, lambda rng, n: rng.uniform(0.03, 0.15))
+    settled = history[1000:]
+    assert min(settled) >= 8
+    assert sum(settled) / len(settled) >= 24
+    assert window.decreases < 50
+
+
+def test_queueing_latency_shrinks_window(bili_main):
+    # 在途请求超过 8 个后延迟随排队线性增长，窗口应停在延迟约为基线两倍（约 16）附近
+    _, history = simulate(bili_main, lambda rng, n: rng.uniform(0.05, 0.06) * max(1.0, n / 8), requests=6000)
+    settled = history[1000:]
+    assert sum(settled) / len(settled) < 24
+
+
+def test_congestion_halves_at_most_once_per_baseline_interval(bili_main):
+    now = [0.0]
+    window = bili_main.AdaptiveWindow("example.com", 32, initial_window=32, clock=lambda: now[0])
+
+    async def run():
+        for _ in range(8):
+            await window.acquire()
+        window.observe_latency(0.1)
+        for _ in range(8):
+            await window.release(congested=True)
+        assert window.window == 16
+        now[0] += 0.1
+        await window.acquire()
+        await window.release(congested=True)
+        assert window.window == 8
+
+    asyncio.run(run())
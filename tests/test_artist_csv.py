@@ -0,0 +1,128 @@
+import contextlib
+import multiprocessing
+import os
+import pickle
+import signal
+
+import pytest
+
+import artist_csv
+
+
+def _increment(path, times):
+    for _ in range(times):
+        with artist_csv.file_lock(path):
+            with open(path, "r", encoding="utf-8") as f:
+                value = int(f.read() or 0)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(str(value + 1))
+
+
+def _hold_forever(path, ready):
+    with artist_csv.file_lock(path):
+        ready.set()
+        signal.pause() if hasattr(signal, "pause") else multiprocessing.Event().wait()
+
+
+def test_file_lock_is_exclusive_across_processes(tmp_path):
+    counter = str(tmp_path / "counter")
+    with open(counter, "w", encoding="utf-8") as f:
+        f.write("0")
+    workers = [multiprocessing.Process(target=_increment, args=(counter, 50)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    with open(counter, encoding="utf-8") as f:
+        assert f.read() == "200"
+
+
+def test_file_lock_released_when_holder_dies(tmp_path):
+    path = str(tmp_path / "Artist.csv")
+    ready = multiprocessing.Event()
+    holder = multiprocessing.Process(target=_hold_forever, args=(path, ready))
+    holder.start()
+    assert ready.wait(10)
+    with pytest.raises(TimeoutError):
+        with artist_csv.file_lock(path, timeout=0.3):
+            pass
+    holder.kill()
+    holder.join()
+    with artist_csv.file_lock(path, timeout=5):
+        with open(f"{path}.lock", encoding="ascii") as f:
+            assert f.read() == str(os.getpid())
+
+
+def _load_many(path, times):
+    snapshot = f"{os.path.splitext(path)[0]}.snapshot"
+    for _ in range(times):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(snapshot)
+        table = artist_csv.load_table(path)
+        assert len(table.rows) == 200
+
+
+def test_concurrent_snapshot_rebuilds_do_not_collide(tmp_path):
+    path = str(tmp_path / "Artist.csv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("uni_id,bili_id,bili_url\n")
+        f.writelines(f"{i:06d},{i},https://space.bilibili.com/{i}\n" for i in range(200))
+    workers = [multiprocessing.Process(target=_load_many, args=(path, 30)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        assert worker.exitcode == 0
+    assert len(artist_csv.load_table(path).rows) == 200
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_atomic_writes_keep_file_mode(tmp_path):
+    path = str(tmp_path / "Artist.csv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("uni_id,bili_id\n000001,1\n")
+    os.chmod(path, 0o644)
+    artist_csv.rewrite_rows_atomic(path, lambda row_no, row: {**row, "bili_id": "2"})
+    assert os.stat(path).st_mode & 0o777 == 0o644
+    fieldnames, rows = artist_csv.read_rows(path)
+    artist_csv.write_rows_atomic(path, fieldnames, rows)
+    assert os.stat(path).st_mode & 0o777 == 0o644
+    assert rows == [{"uni_id": "000001", "bili_id": "2"}]
+
+
+def test_snapshot_restores_short_and_long_rows(tmp_path):
+    path = str(tmp_path / "Artist.csv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("uni_id,bilibili_id,bilibili_url,bilibili_roll_time\n"
+                "000001,1;2,https://space.bilibili.com/1,2026:10:17\n"
+                "000002,3\n"
+                "000003,4,u,,extra1,extra2\n")
+    fresh = artist_csv.load_table(path)
+    cached = artist_csv.load_table(path)
+    assert cached.rows == fresh.rows
+    assert cached.rows[1]["bilibili_url"] is None and cached.rows[2][None] == ["extra1", "extra2"]
+    assert cached.ids == fresh.ids == {"bilibili": [["1", "2"], ["3"], ["4"]]}
+    assert cached.roll_times == fresh.roll_times
+
+
+def test_snapshot_is_not_unpickled(tmp_path):
+    path = str(tmp_path / "Artist.csv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write("uni_id,bilibili_id\n000001,1\n")
+    marker = tmp_path / "pwned"
+
+    class Payload:
+        def __reduce__(self):
+            return open, (str(marker), "w")
+
+    with open(str(tmp_path / "Artist.snapshot"), "wb") as f:
+        pickle.dump(Payload(), f)
+    assert artist_csv.load_table(path).rows == [{"uni_id": "000001", "bilibili_id": "1"}]
+    assert not marker.exists()
+
+
+def test_lock_file_is_not_executable(tmp_path):
+    path = str(tmp_path / "Artist.csv")
+    with artist_csv.file_lock(path):
+        pass
+    assert os.stat(f"{path}.lock").st_mode & 0o111 == 0
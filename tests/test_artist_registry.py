@@ -0,0 +1,48 @@
+from artist_registry import ArtistRegistry
+
+HEADER = "name,uni_id,bilibili_name,bilibili_id,bilibili_url,bilibili_roll_time,tags,tips"
+ROWS = [
+    "甲,000001,a,1,https://space.bilibili.com/1,2025:08:01,,",
+    # 字段比列名多
+    "乙,000002,b;b2,2;3,https://space.bilibili.com/2;https://space.bilibili.com/3,2025:08:01,t,tip,extra1,extra2",
+    # 字段比列名少
+    "丙,000003,c,4,https://space.bilibili.com/4",
+    '"丁, 含逗号",000004,,,,,,',
+]
+
+
+def write_csv(path, rows, newline="\n", trailing=True):
+    content = newline.join([HEADER, *rows]) + (newline if trailing else "")
+    path.write_bytes(content.encode("utf-8"))
+
+
+def test_round_trip_is_byte_identical(tmp_path):
+    csv_path = tmp_path / "Artist.csv"
+    for newline, trailing in (("\n", True), ("\r\n", False)):
+        write_csv(csv_path, ROWS, newline, trailing)
+        original = csv_path.read_bytes()
+        registry = ArtistRegistry(str(csv_path))
+        try:
+            registry.import_csv()
+            registry.set_roll_time("bilibili", "1", "2025:09:01")
+            registry.set_roll_time("bilibili", "1", "2025:08:01")
+            assert registry.export_csv()
+        finally:
+            registry.close()
+        assert csv_path.read_bytes() == original
+
+
+def test_roll_time_update_keeps_long_and_short_rows(tmp_path):
+    csv_path = tmp_path / "Artist.csv"
+    write_csv(csv_path, ROWS)
+    registry = ArtistRegistry(str(csv_path))
+    try:
+        assert registry.set_roll_time("bilibili", "3", "2025:09:01") == 1
+        assert registry.set_roll_time("bilibili", "4", "2025:09:02") == 1
+        assert registry.export_csv()
+    finally:
+        registry.close()
+    lines = csv_path.read_text(encoding="utf-8").split("\n")
+    assert lines[2].endswith(",2025:09:01,t,tip,extra1,extra2")
+    assert lines[3] == "丙,000003,c,4,https://space.bilibili.com/4,2025:09:02"
+    assert lines[1] == ROWS[0] and lines[4] == ROWS[3]
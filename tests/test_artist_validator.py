@@ -0,0 +1,53 @@
+import os
+
+import artist_validator
+
+HEADER = "uni_id,pixiv_name,pixiv_id,pixiv_url,tags,tips\n"
+
+
+def _write(path, *lines):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(HEADER + "".join(lines))
+
+
+def test_normalize_row_leaves_free_text_columns_alone():
+    row = {
+        "uni_id": "000001", "pixiv_name": " 画师 ", "pixiv_id": "", "pixiv_url": "http://pixiv.net/users/1/",
+        "tags": " 风景; 人物 ", "tips": "  备注; 带分号 \x07",
+    }
+    changes = artist_validator.normalize_row(row, ["pixiv"])
+    assert row["pixiv_name"] == "画师"
+    assert row["pixiv_id"] == "1"
+    assert row["pixiv_url"] == "https://www.pixiv.net/users/1"
+    assert row["tags"] == "风景;人物"
+    assert row["tips"] == "  备注; 带分号 \x07"
+    assert "tips" not in {change["column"] for change in changes}
+
+
+def test_dry_run_validates_fixed_rows_without_writing(tmp_path, capsys):
+    path = str(tmp_path / "Artist.csv")
+    _write(path, "000001, 画师 ,1,https://www.pixiv.net/users/1,,\n")
+    with open(path, "rb") as f:
+        original = f.read()
+
+    assert artist_validator.main([path, "--dry-run"]) == 0
+    output = capsys.readouterr().out
+    assert "未写回（--dry-run）" in output
+    assert "多余空格" in output  # 修复报告中的原因
+    assert "有多余空格: ' 画师 '" not in output  # 校验的是修复后的结果
+    with open(path, "rb") as f:
+        assert f.read() == original
+    assert not (tmp_path / "Artist.validation.json").exists()
+
+    report = artist_validator.validate(path)
+    assert report["warnings"] == 1
+
+
+def test_incremental_cache_is_written_without_leftover_temp_files(tmp_path):
+    path = str(tmp_path / "Artist.csv")
+    _write(path, "000001,画师,1,https://www.pixiv.net/users/1,,\n")
+    first = artist_validator.validate(path, incremental=True)
+    second = artist_validator.validate(path, incremental=True)
+    assert (first["checked_rows"], second["checked_rows"]) == (1, 0)
+    assert second["findings"] == first["findings"]
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith(".tmp")) == []
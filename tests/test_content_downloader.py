@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+PROXY = "http://proxy:1"
+
+
+def _downloader(bili_main, tmp_path, **kwargs):
+    state = tmp_path / "state"
+    return bili_main.ContentDownloader(
+        base_dir=str(tmp_path / "downloads"),
+        manifest=bili_main.DownloadManifest(str(state / "download_manifest.db")),
+        retry_queue=bili_main.DownloadRetryQueue(str(state / "failed_downloads.json")),
+        **kwargs,
+    )
+
+
+def _serve(bili_main, tmp_path, handler):
+    """下载器经唯一的代理 PROXY 请求，响应由 handler(request) 生成"""
+    httpx = pytest.importorskip("httpx")
+    downloader = _downloader(bili_main, tmp_path, proxy_manager=bili_main.ProxyManager([{"http": PROXY}]))
+    downloader._clients[PROXY] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return downloader
+
+
+def test_missing_dest_is_relinked_from_blob_store(bili_main, tmp_path):
+    downloader = _downloader(bili_main, tmp_path)
+    url = "https://i0.hdslb.com/bfs/new_dyn/a.jpg"
+    content = b"image-bytes"
+    sha256 = hashlib.sha256(content).hexdigest()
+    tmp_file = tmp_path / "downloaded"
+    tmp_file.write_bytes(content)
+    blob_path = downloader.blob_store.put(str(tmp_file), sha256)
+    old_dest = os.path.join(downloader.base_dir, "user", "draw-1", "old.jpg")
+    os.makedirs(os.path.dirname(old_dest))
+    downloader.blob_store.link(blob_path, old_dest)
+    downloader.manifest.record(url, old_dest, len(content), sha256)
+
+    # 用户删掉了原来的目录，存储中的内容还在：应当重新链接而不是请求网络
+    os.remove(old_dest)
+    os.rmdir(os.path.dirname(old_dest))
+
+    async def no_network(*args, **kwargs):
+        raise AssertionError("不应重新下载")
+
+    downloader.download_file = no_network
+    new_dest = os.path.join(downloader.base_dir, "user", "draw-1", "new.jpg")
+    assert asyncio.run(downloader._download_image("user", "1", url, new_dest))
+    with open(new_dest, "rb") as f:
+        assert f.read() == content
+    assert os.path.samefile(new_dest, blob_path)
+    assert downloader.manifest.lookup(url)["path"] == new_dest
+    assert downloader.skipped_count == 1
+
+    # 存储中的内容也没了时才重新下载
+    os.remove(new_dest)
+    os.remove(blob_path)
+    assert not downloader._reuse_existing(url, new_dest)
+    downloader.manifest.close()
+
+
+@pytest.mark.parametrize("status, proxy_failures", [(404, 0), (403, 0), (407, 1)])
+def test_only_proxy_faults_count_against_the_proxy(bili_main, tmp_path, status, proxy_failures):
+    httpx = pytest.importorskip("httpx")
+    downloader = _serve(bili_main, tmp_path, lambda request: httpx.Response(status))
+    part_path, state_path = downloader._partial_paths("https://i0.hdslb.com/a.jpg")
+    try:
+        asyncio.run(downloader._fetch_stream("https://i0.hdslb.com/a.jpg", part_path, state_path, {}))
+    except (httpx.HTTPStatusError, bili_main.DownloadGoneError):
+        pass
+    stat = downloader.proxy_manager.stats[PROXY]
+    assert (stat["requests"], stat["failures"]) == (1, proxy_failures)
+    downloader.manifest.close()
+
+
+@pytest.mark.parametrize("status, queued", [(404, False), (410, False), (403, True)])
+def test_deleted_resources_are_not_queued_for_retry(bili_main, tmp_path, status, queued):
+    httpx = pytest.importorskip("httpx")
+    requests = []
+
+    async def handler(request):
+        requests.append(request)
+        await asyncio.sleep(0.05)
+        return httpx.Response(status)
+
+    downloader = _serve(bili_main, tmp_path, handler)
+    url = "https://i0.hdslb.com/bfs/new_dyn/gone.jpg"
+    dests = [os.path.join(downloader.base_dir, "user", "draw-1", f"{idx}.jpg") for idx in range(2)]
+
+    async def run():
+        # 两条动态同时下载同一张图，共用一次请求
+        return await asyncio.gather(*(downloader._download_image("user", "1", url, dest) for dest in dests))
+
+    assert asyncio.run(run()) == [False, False]
+    assert len(requests) == 1
+    assert len(downloader.failed_downloads) == 2
+    assert len(downloader.retry_queue) == (2 if queued else 0)
+    downloader.manifest.close()
+
+
+def test_resume_rejects_a_range_that_does_not_start_at_the_offset(bili_main, tmp_path):
+    httpx = pytest.importorskip("httpx")
+    content = bytes(range(100))
+    ranges = []
+
+    async def body():
+        yield content
+
+    def handler(request):
+        ranges.append(request.headers.get("Range"))
+        if request.headers.get("Range"):
+            # CDN 忽略了请求的起点，从 0 开始返回片段
+            return httpx.Response(206, headers={"Content-Range": "bytes 0-99/100"}, content=body())
+        return httpx.Response(200, content=body())
+
+    downloader = _serve(bili_main, tmp_path, handler)
+    url = "https://i0.hdslb.com/bfs/new_dyn/big.jpg"
+    part_path, state_path = downloader._partial_paths(url)
+    with open(part_path, "wb") as f:
+        f.write(content[:40])
+    state = {"url": url, "total": 100, "etag": '"v1"'}
+
+    with pytest.raises(OSError):
+        asyncio.run(downloader._fetch_stream(url, part_path, state_path, state))
+    assert os.path.getsize(part_path) == 0 and state == {}
+
+    assert asyncio.run(downloader._fetch_stream(url, part_path, state_path, state))
+    with open(part_path, "rb") as f:
+        assert f.read() == content
+    assert ranges == ["bytes=40-", None]
+    downloader.manifest.close()
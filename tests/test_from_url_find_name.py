@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("playwright")
+pytest.importorskip("bs4")
+
+import from_url_find_name  # noqa: E402
+
+HEADER = "name,uni_id,weibo_name,weibo_id,weibo_url\n"
+
+
+def test_rows_without_uni_id_are_written_back_to_their_own_row(tmp_path):
+    csv_path = tmp_path / "Artist.csv"
+    csv_path.write_text(
+        HEADER
+        + "甲,,,,*https://weibo.com/u/1\n"
+        + "乙,000002,,,https://weibo.com/u/2\n"
+        + "丙,,,,*https://weibo.com/u/3\n",
+        encoding="utf-8",
+    )
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({}), encoding="utf-8")
+
+    async def scrape(urls, _):
+        return {url: {"display_name": f"name{url[-1]}", "id": url[-1]} for url in urls}
+
+    asyncio.run(from_url_find_name.process_social_platform_profiles(
+        "weibo", str(csv_path), str(config_path), scrape, batch_size=1, rate_limit_seconds=0
+    ))
+    assert csv_path.read_text(encoding="utf-8").splitlines()[1:] == [
+        "甲,,name1,1,https://weibo.com/u/1",
+        "乙,000002,,,https://weibo.com/u/2",
+        "丙,,name3,3,https://weibo.com/u/3",
+    ]
+
+
+def test_rows_changed_during_scraping_are_skipped(tmp_path, monkeypatch):
+    csv_path = tmp_path / "Artist.csv"
+    csv_path.write_text(HEADER + "甲,,,,*https://weibo.com/u/1\n", encoding="utf-8")
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps({}), encoding="utf-8")
+
+    async def scrape(urls, _):
+        # 抓取期间另一个脚本在前面插入了一行
+        csv_path.write_text(HEADER + "新,,,,\n甲,,,,*https://weibo.com/u/1\n", encoding="utf-8")
+        return {url: {"display_name": "name1", "id": "1"} for url in urls}
+
+    asyncio.run(from_url_find_name.process_social_platform_profiles(
+        "weibo", str(csv_path), str(config_path), scrape, rate_limit_seconds=0
+    ))
+    assert csv_path.read_text(encoding="utf-8") == HEADER + "新,,,,\n甲,,,,*https://weibo.com/u/1\n"
@@ -0,0 +1,45 @@
+import asyncio
+import threading
+import time
+
+import artist_csv
+
+HEADER = "name,uni_id,bilibili_name,bilibili_id,bilibili_url,bilibili_roll_time\n"
+
+
+def test_roll_times_are_exported_from_a_worker_thread_without_blocking(bili_main, tmp_path):
+    csv_path = tmp_path / "Artist.csv"
+    csv_path.write_text(HEADER + "甲,000001,甲,42,https://space.bilibili.com/42,\n", encoding="utf-8")
+    output = bili_main.OutputManager(str(csv_path))
+    output.updated_users[42] = "2026:10:17"
+
+    # 另一个脚本持有文件锁一段时间，写回在线程中等待，事件循环照常运行
+    held = threading.Event()
+
+    def hold_lock():
+        with artist_csv.file_lock(str(csv_path)):
+            held.set()
+            time.sleep(0.5)
+
+    holder = threading.Thread(target=hold_lock)
+    holder.start()
+    held.wait()
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        await asyncio.to_thread(output.update_csv, [42])
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(run()) > 20
+    holder.join()
+    output.close()
+    assert csv_path.read_text(encoding="utf-8").splitlines()[1].endswith(",2026:10:17")
@@ -0,0 +1,24 @@
+import collections
+import random
+
+
+def test_dead_proxy_is_not_preferred(bili_main):
+    random.seed(1)
+    manager = bili_main.ProxyManager([{"http": "http://dead:1"}, {"http": "http://a:1"}, {"http": "http://b:1"}])
+    picks = collections.Counter()
+    for _ in range(200):
+        proxy = manager.choose()
+        picks[proxy] += 1
+        if proxy == "http://dead:1":
+            manager.report(proxy, ok=False)
+        else:
+            manager.report(proxy, ok=True, latency=0.1)
+    assert picks["http://dead:1"] < 30
+    assert picks["http://a:1"] > 60 and picks["http://b:1"] > 60
+
+
+def test_untried_proxies_are_tried_first(bili_main):
+    manager = bili_main.ProxyManager([{"http": "http://a:1"}, {"http": "http://b:1"}])
+    first = manager.choose()
+    manager.report(first, ok=False)
+    assert manager.choose() != first
@@ -0,0 +1,37 @@
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+
+def _harvester(bili_main, tmp_path):
+    """不读取配置与默认状态目录，直接组装离线重处理需要的部分"""
+    harvester = bili_main.BiliDynamicHarvester.__new__(bili_main.BiliDynamicHarvester)
+    harvester.user_manager = bili_main.UserManager()
+    harvester.downloader = bili_main.ContentDownloader(
+        base_dir=str(tmp_path / "downloads"),
+        manifest=bili_main.DownloadManifest(str(tmp_path / "download_manifest.db")),
+        retry_queue=bili_main.DownloadRetryQueue(str(tmp_path / "failed_downloads.json")),
+    )
+    harvester.raw_archive = bili_main.RawArchive(str(tmp_path / "raw_dynamics.db"))
+    return harvester
+
+
+def test_replay_overwrites_results_and_closes_archive(bili_main, tmp_path):
+    archive = bili_main.RawArchive(str(tmp_path / "raw_dynamics.db"))
+    archive.add({
+        "id": "1", "user_id": 42, "user_name": "甲", "type": "DYNAMIC_TYPE_WORD", "timestamp": 1,
+        "raw_data": {"id_str": "1", "type": "DYNAMIC_TYPE_WORD", "modules": {}},
+    })
+    archive.close()
+
+    for _ in range(2):
+        harvester = _harvester(bili_main, tmp_path)
+        asyncio.run(harvester.replay())
+        with pytest.raises(sqlite3.ProgrammingError):
+            harvester.raw_archive.conn.execute("SELECT 1")
+
+    with open(tmp_path / "downloads" / "replay_results.jsonl", encoding="utf-8") as f:
+        results = [json.loads(line) for line in f]
+    assert [result["dynamic_id"] for result in results] == ["1"]
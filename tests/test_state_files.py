@@ -0,0 +1,25 @@
+import json
+import os
+import threading
+
+
+def test_concurrent_atomic_json_writes_do_not_collide(bili_main, tmp_path):
+    path = str(tmp_path / "state" / "cursors.json")
+    errors = []
+
+    def write(n):
+        try:
+            for i in range(50):
+                bili_main._atomic_write_json(path, {"writer": n, "i": i, "pad": "x" * 4096})
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["i"] == 49
+    assert os.listdir(tmp_path / "state") == ["cursors.json"]